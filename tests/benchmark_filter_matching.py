@@ -0,0 +1,109 @@
+import random
+import string
+import time
+from types import SimpleNamespace
+
+import regex as re
+from loguru import logger
+
+from threativore.classes.filterset import FilterSet
+from threativore.enums import FilterAction, FilterType
+
+FILTER_COUNT = 300
+COMMENT_COUNT = 2000
+random.seed(42)
+
+
+def random_word(length=8):
+    return "".join(random.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def generate_filters():
+    filters = []
+    for filter_id in range(1, FILTER_COUNT + 1):
+        template = random.choice([
+            "{w}",
+            r"{w}\.com",
+            r"buy\s+{w}\s+now",
+            r"\b{w}\d+\b",
+            r"(cheap|free) {w}",
+        ])
+        filters.append(
+            SimpleNamespace(
+                id=filter_id,
+                regex=template.format(w=random_word()),
+                reason="Benchmark",
+                description=None,
+                filter_action=random.choice(list(FilterAction)),
+                filter_type=random.choice([FilterType.COMMENT, FilterType.USERNAME]),
+                scope="global",
+                normalized=False,
+            )
+        )
+    return filters
+
+
+def generate_comments(filters):
+    comments = []
+    for _ in range(COMMENT_COUNT):
+        content = " ".join(random_word(random.randint(2, 10)) for _ in range(random.randint(10, 200)))
+        # Roughly 1 in 20 comments is spam
+        if random.random() < 0.05:
+            spam_filter = random.choice(filters)
+            content += " " + spam_filter.regex.replace("\\s+", " ").replace("\\.", ".").replace("\\b", "").replace("\\d+", "7")
+        comments.append({"content": content, "name": random_word()})
+    return comments
+
+
+def get_actioned_filters(filters, comment, candidate_ids=None):
+    """Mimics the filter loop of Threativore.check_comments_page, returning the IDs of the filters it would action"""
+    actioned = []
+    entity_reported = False
+    for tfilter in filters:
+        if entity_reported and tfilter.filter_action == FilterAction.REPORT:
+            continue
+        if candidate_ids is not None and tfilter.id not in candidate_ids:
+            continue
+        text = comment["content"] if tfilter.filter_type == FilterType.COMMENT else comment["name"]
+        if candidate_ids is None:
+            filter_match = re.search(tfilter.regex, text, re.IGNORECASE)
+        else:
+            filter_match = tfilter.search(text)
+        if not filter_match:
+            continue
+        actioned.append(tfilter.id)
+        if tfilter.filter_action == FilterAction.REPORT:
+            entity_reported = True
+        else:
+            break
+    return actioned
+
+
+@logger.catch
+def benchmark_filter_matching():
+    filters = generate_filters()
+    comments = generate_comments(filters)
+    sorted_filters = sorted(
+        [f for f in filters if f.filter_type == FilterType.COMMENT] + [f for f in filters if f.filter_type == FilterType.USERNAME],
+        key=lambda x: x.filter_action.value,
+    )
+    start = time.perf_counter()
+    legacy_results = [get_actioned_filters(sorted_filters, c) for c in comments]
+    legacy_time = time.perf_counter() - start
+
+    filter_set = FilterSet(filters)
+    start = time.perf_counter()
+    combined_results = []
+    for c in comments:
+        candidate_ids = filter_set.get_candidate_ids({FilterType.COMMENT: [c["content"]], FilterType.USERNAME: [c["name"]]})
+        combined_results.append(get_actioned_filters(filter_set.get_filters(FilterType.COMMENT, FilterType.USERNAME), c, candidate_ids))
+    combined_time = time.perf_counter() - start
+
+    assert legacy_results == combined_results, "The FilterSet picked different filters than the legacy loop"
+    matched = len([r for r in legacy_results if r])
+    logger.info(f"{FILTER_COUNT} filters, {COMMENT_COUNT} comments, {matched} matched")
+    logger.info(f"Per-filter loop: {legacy_time:.3f}s ({legacy_time / COMMENT_COUNT * 1000:.3f}ms per comment)")
+    logger.info(f"FilterSet: {combined_time:.3f}s ({combined_time / COMMENT_COUNT * 1000:.3f}ms per comment)")
+
+
+benchmark_filter_matching()
@@ -0,0 +1,67 @@
+import os
+import random
+import tempfile
+from datetime import datetime
+
+from loguru import logger
+from sqlalchemy import Column, DateTime, Enum, Integer, MetaData, Table, Text, UniqueConstraint, create_engine, insert, text
+
+from threativore.enums import EntityType
+from threativore.orm.seen import Seen
+
+ROW_COUNT = 200000
+random.seed(42)
+
+
+def get_legacy_seen_table(metadata):
+    """The layout of the seen table up to 0.11.0"""
+    return Table(
+        "seen",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("entity_id", Integer, nullable=False, index=True),
+        Column("entity_type", Enum(EntityType), nullable=False, index=True),
+        Column("entity_url", Text, nullable=False),
+        Column("created", DateTime, default=datetime.utcnow, nullable=False),
+        Column("updated", DateTime, default=datetime.utcnow, nullable=False, index=True),
+        UniqueConstraint("entity_id", "entity_type", name="entity_id_type"),
+    )
+
+
+def measure_table(table, rows) -> dict[str, int]:
+    """Fills the table in a fresh sqlite DB and returns the bytes used by the table and each of its indexes"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmpdir, 'seen.db')}")
+        table.metadata.create_all(engine)
+        with engine.begin() as connection:
+            connection.execute(insert(table), rows)
+        with engine.connect() as connection:
+            sizes = dict(connection.execute(text("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name")).all())
+        engine.dispose()
+    return {name: size for name, size in sizes.items() if name != "sqlite_schema"}
+
+
+@logger.catch
+def benchmark_seen_index():
+    now = datetime.utcnow()
+    rows = []
+    for entity_id in random.sample(range(1, ROW_COUNT * 10), ROW_COUNT):
+        entity_type = random.choice([EntityType.COMMENT, EntityType.COMMENT, EntityType.COMMENT, EntityType.POST])
+        rows.append({
+            "entity_id": entity_id,
+            "entity_type": entity_type,
+            "entity_url": f"https://lemmy.example.com/{entity_type.name.lower()}/{entity_id}",
+            "created": now,
+            "updated": now,
+        })
+    legacy_sizes = measure_table(get_legacy_seen_table(MetaData()), rows)
+    compact_rows = [{"entity_id": row["entity_id"], "entity_type": row["entity_type"], "updated": now} for row in rows]
+    compact_sizes = measure_table(Seen.__table__.to_metadata(MetaData()), compact_rows)
+    logger.info(f"{ROW_COUNT} seen rows")
+    for label, sizes in [("Legacy", legacy_sizes), ("Compact", compact_sizes)]:
+        for name, size in sorted(sizes.items()):
+            logger.info(f"{label} {name}: {size / 1024 / 1024:.2f} MiB")
+        logger.info(f"{label} total: {sum(sizes.values()) / 1024 / 1024:.2f} MiB")
+
+
+benchmark_seen_index()
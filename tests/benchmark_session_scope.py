@@ -0,0 +1,76 @@
+import gc
+
+from loguru import logger
+
+import threativore.database as database
+from threativore.enums import EntityType
+from threativore.flask import APP, db
+from threativore.orm.filters import FilterMatch
+from threativore.utils import get_rss_bytes
+
+ITERATIONS = 1000
+MATCHES_PER_ITERATION = 20
+BENCHMARK_ENTITY_ID_START = 900000000
+BENCHMARK_URL_PREFIX = "https://lemmy.example.com/comment/benchmark_session_scope_"
+
+
+def process_page(iteration: int):
+    """Stands for one iteration of the scanner: it writes a few rows and reads them back as ORM objects"""
+    match_ids = []
+    for match_index in range(MATCHES_PER_ITERATION):
+        match_ids.append(database.insert_filter_match(
+            url=f"{BENCHMARK_URL_PREFIX}{iteration}_{match_index}",
+            content="benchmark content " * 20,
+            entity_id=BENCHMARK_ENTITY_ID_START + iteration * MATCHES_PER_ITERATION + match_index,
+            entity_type=EntityType.COMMENT,
+            actor_id="https://lemmy.example.com/u/benchmark",
+            filter_id=None,
+        ))
+    db.session.commit()
+    FilterMatch.query.filter(FilterMatch.id.in_(match_ids)).all()
+
+
+def log_gauges(label: str, iteration: int, baseline_rss: int, engine):
+    """Logged at the point where the thread would go to sleep until its next iteration"""
+    gc.collect()
+    logger.info(
+        f"{label} iteration {iteration}: RSS +{(get_rss_bytes() - baseline_rss) / 1024 / 1024:.1f} MiB, "
+        f"{engine.pool.checkedout()} DB connections held while sleeping"
+    )
+
+
+def run_long_lived_session(engine):
+    """How the background threads used to work, with one app context around the whole loop"""
+    baseline_rss = get_rss_bytes()
+    with APP.app_context():
+        for iteration in range(ITERATIONS):
+            process_page(iteration)
+            if (iteration + 1) % (ITERATIONS // 4) == 0:
+                logger.info(f"Long-lived session holds an open transaction: {db.session().in_transaction()}")
+                log_gauges("Long-lived session", iteration + 1, baseline_rss, engine)
+
+
+def run_session_per_iteration(engine):
+    baseline_rss = get_rss_bytes()
+    for iteration in range(ITERATIONS):
+        with APP.app_context():
+            process_page(ITERATIONS + iteration)
+        if (iteration + 1) % (ITERATIONS // 4) == 0:
+            log_gauges("Session per iteration", iteration + 1, baseline_rss, engine)
+
+
+@logger.catch
+def benchmark_session_scope():
+    with APP.app_context():
+        engine = db.engine
+    try:
+        # The per-iteration run goes first, so that it can't benefit from memory freed by the other one
+        run_session_per_iteration(engine)
+        run_long_lived_session(engine)
+    finally:
+        with APP.app_context():
+            FilterMatch.query.filter(FilterMatch.url.like(f"{BENCHMARK_URL_PREFIX}%")).delete(synchronize_session=False)
+            db.session.commit()
+
+
+benchmark_session_scope()
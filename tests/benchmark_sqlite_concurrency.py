@@ -0,0 +1,104 @@
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from loguru import logger
+from sqlalchemy import create_engine, event, insert, select
+from sqlalchemy.exc import OperationalError
+
+from threativore.enums import EntityType, UserRoleTypes
+from threativore.flask import db, set_sqlite_pragmas
+from threativore.orm.seen import Seen
+from threativore.orm.user import User, UserRole, UserTag
+
+DURATION = 10
+READER_COUNT = 4
+USER_COUNT = 1000
+WRITE_BATCH_SIZE = 50
+
+
+def prepare_db(engine):
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(User.__table__), [{"user_url": f"https://lemmy.example.com/u/user{i}"} for i in range(USER_COUNT)])
+        connection.execute(insert(UserRole.__table__), [{"user_id": i + 1, "user_role": UserRoleTypes.KNOWN, "value": True} for i in range(USER_COUNT)])
+        connection.execute(
+            insert(UserTag.__table__),
+            [{"user_id": i + 1, "tag": f"tag{t}", "value": "true"} for i in range(USER_COUNT) for t in range(5)],
+        )
+
+
+def scan(engine, stop: threading.Event, stats: dict):
+    """Writes seen rows in small transactions, like the scanner does for every page"""
+    entity_id = 0
+    while not stop.is_set():
+        rows = []
+        for _ in range(WRITE_BATCH_SIZE):
+            entity_id += 1
+            rows.append({"entity_type": EntityType.COMMENT, "entity_id": entity_id, "updated": datetime.utcnow()})
+        try:
+            with engine.begin() as connection:
+                connection.execute(insert(Seen.__table__), rows)
+            stats["writes"] += 1
+        except OperationalError:
+            stats["write_errors"] += 1
+
+
+def read_users(engine, stop: threading.Event, latencies: list, stats: dict):
+    """Reads a user with their roles and tags, like the user API does"""
+    user_id = 0
+    while not stop.is_set():
+        user_id = user_id % USER_COUNT + 1
+        start = time.perf_counter()
+        try:
+            with engine.connect() as connection:
+                connection.execute(select(User.__table__).where(User.__table__.c.id == user_id)).all()
+                connection.execute(select(UserRole.__table__).where(UserRole.__table__.c.user_id == user_id)).all()
+                connection.execute(select(UserTag.__table__).where(UserTag.__table__.c.user_id == user_id)).all()
+            latencies.append(time.perf_counter() - start)
+        except OperationalError:
+            stats["read_errors"] += 1
+
+
+def run_profile(label: str, tuned: bool):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(tmpdir, 'threativore.db')}",
+            pool_size=READER_COUNT + 1,
+        )
+        if tuned:
+            event.listen(engine, "connect", set_sqlite_pragmas)
+        prepare_db(engine)
+        stop = threading.Event()
+        latencies = []
+        stats = {"writes": 0, "write_errors": 0, "read_errors": 0}
+        threads = [threading.Thread(target=scan, args=(engine, stop, stats))]
+        threads += [threading.Thread(target=read_users, args=(engine, stop, latencies, stats)) for _ in range(READER_COUNT)]
+        for thread in threads:
+            thread.start()
+        time.sleep(DURATION)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+    latencies.sort()
+    logger.info(
+        f"{label}: {len(latencies) / DURATION:.0f} reads/s, "
+        f"p50 {statistics.median(latencies) * 1000:.2f}ms, "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f}ms, "
+        f"max {latencies[-1] * 1000:.2f}ms, "
+        f"{stats['writes'] / DURATION:.0f} write batches/s, "
+        f"{stats['read_errors']} read errors, {stats['write_errors']} write errors"
+    )
+
+
+@logger.catch
+def benchmark_sqlite_concurrency():
+    run_profile("Rollback journal", tuned=False)
+    run_profile("WAL profile", tuned=True)
+
+
+benchmark_sqlite_concurrency()
@@ -0,0 +1,60 @@
+import time
+
+from loguru import logger
+from sqlalchemy import event
+
+import threativore.database as database
+from threativore.enums import UserRoleTypes
+from threativore.flask import APP, db
+from threativore.orm.user import User, UserAlias, UserFlag, UserTag
+
+BENCHMARK_USER_URL = "https://lemmy.example.com/u/benchmark_user_details"
+REQUEST_COUNT = 200
+
+
+def create_benchmark_user():
+    user = User(user_url=BENCHMARK_USER_URL)
+    db.session.add(user)
+    db.session.commit()
+    user.add_role(UserRoleTypes.KNOWN)
+    user.add_role(UserRoleTypes.VOTING)
+    for tag_index in range(5):
+        db.session.add(UserTag(user_id=user.id, tag=f"benchmark_tag_{tag_index}", value="true", description="Benchmark"))
+    for alias_index in range(3):
+        db.session.add(UserAlias(user_id=user.id, user_url=f"https://lemmy{alias_index}.example.com/u/benchmark_user_details"))
+    db.session.add(UserFlag(user_id=user.id, flag="warning", reason="Benchmark"))
+    db.session.commit()
+
+
+def measure(label: str, get_details):
+    """Runs get_details on a fresh session each time, like a new API request would, and logs the queries and time it took"""
+    queries = []
+
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        queries.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", count_query)
+    start = time.perf_counter()
+    for _ in range(REQUEST_COUNT):
+        db.session.expunge_all()
+        details = get_details()
+    elapsed = time.perf_counter() - start
+    event.remove(db.engine, "before_cursor_execute", count_query)
+    logger.info(f"{label}: {len(queries) / REQUEST_COUNT:.1f} queries per request, {elapsed / REQUEST_COUNT * 1000:.3f}ms per request")
+    return details
+
+
+@logger.catch
+def benchmark_user_details():
+    with APP.app_context():
+        create_benchmark_user()
+        try:
+            legacy_details = measure("get_user().get_details()", lambda: database.get_user(BENCHMARK_USER_URL).get_details(2))
+            loader_details = measure("get_user_details()", lambda: database.get_user_details(BENCHMARK_USER_URL, 2))
+            assert legacy_details == loader_details, "The details loader returned different details"
+        finally:
+            db.session.delete(database.get_user(BENCHMARK_USER_URL))
+            db.session.commit()
+
+
+benchmark_user_details()
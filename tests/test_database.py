@@ -0,0 +1,33 @@
+from threativore import database
+from threativore.enums import EntityType
+from threativore.flask import APP, db
+from threativore.orm.filters import FilterMatch
+
+TEST_ENTITY_ID = 910000000
+TEST_REPORT_ID = 910000000
+TEST_URL_PREFIX = "https://lemmy.example.com/test_database_"
+
+
+def insert_test_match(entity_id: int, entity_type: EntityType, report_id: int | None = None) -> int:
+    return database.insert_filter_match(
+        actor_id="https://lemmy.example.com/u/test",
+        entity_id=entity_id,
+        entity_type=entity_type,
+        report_id=report_id,
+        url=f"{TEST_URL_PREFIX}{entity_id}",
+        content="test content",
+        filter_id=None,
+    )
+
+
+def test_insert_filter_match_duplicate_report():
+    with APP.app_context():
+        try:
+            first_match_id = insert_test_match(TEST_ENTITY_ID, EntityType.COMMENT, TEST_REPORT_ID)
+            # Comment and post reports are numbered separately, so a report ID can come back for another entity
+            assert insert_test_match(TEST_ENTITY_ID + 1, EntityType.POST, TEST_REPORT_ID) == first_match_id
+            assert insert_test_match(TEST_ENTITY_ID, EntityType.COMMENT) == first_match_id
+            assert FilterMatch.query.filter(FilterMatch.url.like(f"{TEST_URL_PREFIX}%")).count() == 1
+        finally:
+            FilterMatch.query.filter(FilterMatch.url.like(f"{TEST_URL_PREFIX}%")).delete(synchronize_session=False)
+            db.session.commit()
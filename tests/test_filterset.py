@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+
+from threativore.classes.filterset import CombinedMatcher, FilterSet
+from threativore.enums import FilterAction, FilterType
+
+
+def make_filter(filter_id: int, regex: str, filter_type: FilterType = FilterType.USERNAME):
+    return SimpleNamespace(
+        id=filter_id,
+        regex=regex,
+        reason="Testing",
+        description=None,
+        filter_action=FilterAction.REMOVE,
+        filter_type=filter_type,
+        scope="global",
+        normalized=False,
+    )
+
+
+def test_unmergeable_patterns():
+    for regex in [r"(a)\1", r"(?P<x>a)(?P=x)", r"(a(?R)?b)", r"(?i)abc", r"(a)?(?(1)b|c)", r"(?P<x>a)?(?(x)b|c)", r"(?P<x>a)?(?(<x>)b|c)"]:
+        assert not CombinedMatcher.is_mergeable(regex), regex
+    for regex in [r"abc", r"(?:a|b)c", r"(?=a)ab", r"(?(?=a)ab|c)"]:
+        assert CombinedMatcher.is_mergeable(regex), regex
+
+
+def test_numbered_conditional_stays_a_candidate():
+    filter_set = FilterSet([make_filter(1, r"x+y"), make_filter(2, r"(a)?(?(1)b|c)")])
+    assert 2 in filter_set.get_candidate_ids({FilterType.USERNAME: ["ab"]})
+
+
+def test_dotted_capital_i_selects_literal_filter():
+    filter_set = FilterSet([make_filter(1, r"ixy\d", FilterType.COMMENT)])
+    assert filter_set.get_candidate_ids({FilterType.COMMENT: ["İxy1"]}) == {1}
@@ -1,30 +1,34 @@
 from dotenv import load_dotenv
 import socket
 import hashlib
+import multiprocessing
 from threativore.logger import logger
 
 load_dotenv()
 
-from threativore.apis import apiv1
-from threativore.flask import APP
-from threativore.consts import THREATIVORE_VERSION
-from threativore.argparser import args
-from threativore.routes import * 
-from threativore.threads import schedule_weekly_download
+# The filter pool workers are spawned processes which import this package again.
+# They only need the filter classes, not the API or another set of scanning threads.
+if multiprocessing.current_process().name == "MainProcess":
+    from threativore.apis import apiv1
+    from threativore.flask import APP
+    from threativore.consts import THREATIVORE_VERSION
+    from threativore.argparser import args
+    from threativore.routes import * 
+    from threativore.threads import schedule_weekly_download
 
-APP.register_blueprint(apiv1)
+    APP.register_blueprint(apiv1)
 
-@APP.after_request
-def after_request(response):
-    response.headers["Access-Control-Allow-Origin"] = "*"
-    response.headers["Access-Control-Allow-Methods"] = "POST, GET, OPTIONS, PUT, DELETE, PATCH"
-    response.headers["Access-Control-Allow-Headers"] = "Accept, Content-Type, Content-Length, Accept-Encoding, X-CSRF-Token, apikey, Client-Agent, X-Fields"
-    response.headers["Threativore-Node"] = f"{socket.gethostname()}:{args.port}:{THREATIVORE_VERSION}"
-    try:
-        etag = hashlib.sha1(response.get_data()).hexdigest()
-    except RuntimeError:
-        etag = "Runtime Error"
-    response.headers["ETag"] = etag
-    return response
+    @APP.after_request
+    def after_request(response):
+        response.headers["Access-Control-Allow-Origin"] = "*"
+        response.headers["Access-Control-Allow-Methods"] = "POST, GET, OPTIONS, PUT, DELETE, PATCH"
+        response.headers["Access-Control-Allow-Headers"] = "Accept, Content-Type, Content-Length, Accept-Encoding, X-CSRF-Token, apikey, Client-Agent, X-Fields"
+        response.headers["Threativore-Node"] = f"{socket.gethostname()}:{args.port}:{THREATIVORE_VERSION}"
+        try:
+            etag = hashlib.sha1(response.get_data()).hexdigest()
+        except RuntimeError:
+            etag = "Runtime Error"
+        response.headers["ETag"] = etag
+        return response
 
-schedule_weekly_download()
\ No newline at end of file
+    schedule_weekly_download()
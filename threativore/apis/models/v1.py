@@ -67,3 +67,29 @@ class Models:
             'expires': fields.DateTime(description="Expiration time"),
             'created': fields.DateTime(description="Creation time"),
         })
+        self.response_model_filter_stats = api.model('FilterStats', {
+            'filter_id': fields.Integer(description="The ID of the filter"),
+            'regex': fields.String(description="The regex of the filter"),
+            'filter_type': fields.String(description="The type of the filter", enum=[i.name for i in enums.FilterType]),
+            'filter_action': fields.String(description="The action of the filter", enum=[i.name for i in enums.FilterAction]),
+            'evaluations': fields.Integer(description="How many times this filter has been run against a text"),
+            'matches': fields.Integer(description="How many of those evaluations matched"),
+            'timeouts': fields.Integer(description="How many of those evaluations ran out of time"),
+            'total_runtime': fields.Float(description="The cumulative seconds spent evaluating this filter"),
+            'p99_runtime': fields.Float(description="The 99th percentile of the seconds a single evaluation of this filter takes"),
+            'updated': fields.DateTime(description="When these stats were last flushed"),
+        })
+        self.response_model_filter_backtest = api.model('FilterBacktest', {
+            'regex': fields.String(description="The regex which was backtested"),
+            'filter_type': fields.String(description="The type of filter which was backtested", enum=[i.name for i in enums.FilterType]),
+            'corpus_items': fields.Integer(description="How many recently scanned texts it ran against"),
+            'corpus_matches': fields.Integer(description="How many of the recently scanned texts it matched"),
+            'uncaught_matches': fields.Integer(description="How many of its matches no filter caught when they were scanned. Either new spam or false positives."),
+            'uncaught_samples': fields.List(fields.String(description="The start of some of the texts no filter caught")),
+            'filter_match_items': fields.Integer(description="How many past filter matches it ran against"),
+            'filter_match_matches': fields.Integer(description="How many of the past filter matches it matched"),
+            'timeouts': fields.Integer(description="How many texts it ran out of time on"),
+            'total_runtime': fields.Float(description="The seconds it took to run against all texts"),
+            'time_per_item': fields.Float(description="The average seconds it took per text"),
+            'partial': fields.Boolean(description="Whether it ran out of time before going through all the texts, so the counts are incomplete"),
+        })
@@ -2,9 +2,12 @@ import threativore.apis.v1.user as user
 import threativore.apis.v1.governance as governance
 import threativore.apis.v1.tags as tags
 import threativore.apis.v1.webhooks as webhooks
+import threativore.apis.v1.filters as filters
 from threativore.apis.v1.user import api
 
 api.add_resource(user.User, "/user/<string:username>")
 api.add_resource(governance.OpenVotes, "/open_votes")
 api.add_resource(tags.Tag, "/tag/<string:tag>")
 api.add_resource(webhooks.KoFi, "/webhooks/kofi")
+api.add_resource(filters.FilterStats, "/filters/stats")
+api.add_resource(filters.FilterBacktest, "/filters/backtest")
@@ -0,0 +1,90 @@
+from flask_restx import Resource, reqparse
+from threativore import database
+from threativore import exceptions as e
+from threativore.apis.v1.base import *
+from threativore.config import Config
+from threativore.enums import FilterType
+from threativore import utils
+from threativore.classes.backtest import run_backtest
+from threativore.main import threativore
+
+
+class FilterStats(Resource):
+    get_parser = reqparse.RequestParser()
+    get_parser.add_argument("apikey", type=str, required=True, help="A threativore admin key.", location='headers')
+    get_parser.add_argument("Client-Agent", default="unknown:0:unknown", type=str, required=False, help="The client name and version.", location="headers")
+    get_parser.add_argument(
+        "sort",
+        type=str,
+        default="total_runtime",
+        choices=["total_runtime", "p99_runtime", "evaluations", "matches", "timeouts"],
+        required=False,
+        help="The stat by which to sort the filters.",
+        location="args",
+    )
+    get_parser.add_argument("limit", type=int, default=50, required=False, help="How many filters to return.", location="args")
+
+    @api.expect(get_parser)
+    @api.marshal_with(models.response_model_filter_stats, code=200, description='Get Filter Stats', as_list=True)
+    def get(self):
+        '''Evaluation stats for the filters which have run at least once
+        '''
+        self.args = self.get_parser.parse_args()
+        if self.args.apikey not in Config.admin_api_keys:
+            raise e.Unauthorized("Invalid API key")
+        return [s.get_details() for s in database.get_filter_stats(sort_by=self.args.sort, limit=self.args.limit)],200
+
+
+class FilterBacktest(Resource):
+    post_parser = reqparse.RequestParser()
+    post_parser.add_argument("apikey", type=str, required=True, help="A threativore admin key.", location='headers')
+    post_parser.add_argument("Client-Agent", default="unknown:0:unknown", type=str, required=False, help="The client name and version.", location="headers")
+    post_parser.add_argument("regex", type=str, required=False, help="The filter regex to backtest.", location="json")
+    post_parser.add_argument(
+        "filter_type",
+        type=str,
+        required=False,
+        choices=[i.name for i in FilterType],
+        help="The type of filter to backtest. Decides which texts it runs against.",
+        location="json",
+    )
+    post_parser.add_argument(
+        "filter_id",
+        type=int,
+        required=False,
+        help="An existing filter to backtest. Its regex and type are used unless others are provided.",
+        location="json",
+    )
+
+    @api.expect(post_parser)
+    @api.marshal_with(models.response_model_filter_backtest, code=200, description='Backtest a filter')
+    def post(self):
+        '''Run a filter against the recently scanned texts and past filter matches, without adding it
+        '''
+        self.args = self.post_parser.parse_args()
+        if self.args.apikey not in Config.admin_api_keys:
+            raise e.Unauthorized("Invalid API key")
+        regex = self.args.regex
+        filter_type = FilterType[self.args.filter_type] if self.args.filter_type else None
+        if self.args.filter_id is not None:
+            existing_filter = database.get_filter_by_id(self.args.filter_id)
+            if not existing_filter:
+                raise e.NotFound(f"filter ID {self.args.filter_id} does not exist.")
+            if regex is None:
+                regex = existing_filter.regex
+            if filter_type is None:
+                filter_type = existing_filter.filter_type
+        if regex is None or filter_type is None:
+            raise e.BadRequest("You need to provide either a regex and filter_type, or a filter_id")
+        if not utils.validate_regex(regex):
+            raise e.BadRequest(f"Invalid filter regex: {regex}")
+        threativore.filters.check_regex_complexity(regex)
+        result = run_backtest(
+            regex=regex,
+            filter_type=filter_type,
+            max_items=Config.backtest_max_items,
+            chunk_size=Config.backtest_chunk_size,
+            timeout=Config.filter_regex_timeout,
+            time_budget=Config.backtest_time_budget,
+        )
+        return result.get_details(),200
@@ -8,6 +8,7 @@ from threativore import exceptions as e
 from threativore.main import threativore
 from threativore.config import Config
 from threativore.enums import UserRoleTypes
+from threativore.privileged_actors import privileged_actors
 from threativore import utils
 from threativore.apis.v1.base import *
 
@@ -29,13 +30,13 @@ class User(Resource):
         if '@' not in username:
             username = username + '@' + Config.lemmy_domain
         user_url = utils.username_to_url(username)
-        user = database.get_user(user_url)
-        if not user:
-            raise e.NotFound(f"{user_url} not found")
         privilege = 0
         if self.args.apikey in Config.admin_api_keys:
             privilege = 2
-        return user.get_details(privilege),200
+        user_details = database.get_user_details(user_url, privilege)
+        if not user_details:
+            raise e.NotFound(f"{user_url} not found")
+        return user_details,200
         
     put_parser = reqparse.RequestParser()
     put_parser.add_argument("apikey", type=str, required=True, help="A threativore admin key.", location='headers')
@@ -152,7 +153,7 @@ class User(Resource):
                 if user_tag.tag not in [t["tag"] for t in self.args.tags]:
                     logger.debug(f"Removing tag: {user_tag.tag}")
                     user.remove_tag(user_tag.tag)
-            for user_role in user.roles:
+            for user_role in list(user.roles):
                 try:
                     if user_role.user_role not in [UserRoleTypes[ur.upper()] for ur in self.args.roles]:
                         user.remove_role(user_role.user_role)
@@ -197,6 +198,8 @@ class User(Resource):
         logger.info(f"{Config.admin_api_keys[self.args.apikey]} is deleting a user: {user_url}")
         user = database.get_user(user_url)
         if user:
+            user_urls = {user.user_url} | {alias.user_url for alias in user.aliases}
             db.session.delete(user)
             db.session.commit()
+            privileged_actors.remove_urls(user_urls)
         return {"message":"OK."},200
\ No newline at end of file
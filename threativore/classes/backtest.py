@@ -0,0 +1,131 @@
+import time
+
+import regex as re
+
+import threativore.database as database
+from threativore.enums import EntityType, FilterType
+
+# Which corpus texts each filter type would have run against during scanning
+CORPUS_CONTENT_TYPES = {
+    FilterType.REPORT: [FilterType.COMMENT],
+    FilterType.COMMENT: [FilterType.COMMENT],
+    FilterType.USERNAME: [FilterType.USERNAME],
+    FilterType.URL: [FilterType.URL],
+}
+# Which past filter matches contain texts each filter type would have run against
+MATCH_FILTER_TYPES = {
+    FilterType.REPORT: [FilterType.REPORT, FilterType.COMMENT],
+    FilterType.COMMENT: [FilterType.REPORT, FilterType.COMMENT],
+    FilterType.USERNAME: [FilterType.USERNAME],
+    FilterType.URL: [FilterType.URL],
+}
+
+
+class BacktestResult:
+    # How many of the uncaught matches to include as examples
+    max_samples: int = 5
+
+    def __init__(self, regex: str, filter_type: FilterType):
+        self.regex = regex
+        self.filter_type = filter_type
+        self.corpus_items = 0
+        self.corpus_matches = 0
+        # Corpus matches which no filter caught when they were scanned. Either new spam, or false positives.
+        self.uncaught_matches = 0
+        self.uncaught_samples: list[str] = []
+        self.filter_match_items = 0
+        self.filter_match_matches = 0
+        self.timeouts = 0
+        self.runtime = 0.0
+        # Whether the run was cut short by its time budget, so the counts only cover part of the texts
+        self.partial = False
+
+    @property
+    def items(self) -> int:
+        return self.corpus_items + self.filter_match_items
+
+    @property
+    def time_per_item(self) -> float:
+        if self.items == 0:
+            return 0.0
+        return self.runtime / self.items
+
+    def get_details(self):
+        return {
+            "regex": self.regex,
+            "filter_type": self.filter_type.name,
+            "corpus_items": self.corpus_items,
+            "corpus_matches": self.corpus_matches,
+            "uncaught_matches": self.uncaught_matches,
+            "uncaught_samples": self.uncaught_samples,
+            "filter_match_items": self.filter_match_items,
+            "filter_match_matches": self.filter_match_matches,
+            "timeouts": self.timeouts,
+            "total_runtime": self.runtime,
+            "time_per_item": self.time_per_item,
+            "partial": self.partial,
+        }
+
+
+def run_backtest(
+    regex: str,
+    filter_type: FilterType,
+    max_items: int,
+    chunk_size: int = 1000,
+    timeout: float | None = None,
+    time_budget: float | None = None,
+) -> BacktestResult:
+    """Runs the regex against the latest scanned texts and the content of past filter matches.
+    Both are streamed from the DB chunk_size rows at a time, so that we never hold the whole history in memory.
+    Once time_budget seconds have passed, it stops and returns what it has gathered so far, marked as partial."""
+    pattern = re.compile(regex, re.IGNORECASE)
+    result = BacktestResult(regex, filter_type)
+    deadline = time.monotonic() + time_budget if time_budget else None
+
+    def is_out_of_time() -> bool:
+        if deadline is not None and time.monotonic() >= deadline:
+            result.partial = True
+        return result.partial
+
+    def search(text: str) -> bool:
+        start = time.perf_counter()
+        try:
+            return pattern.search(text, timeout=timeout) is not None
+        except TimeoutError:
+            result.timeouts += 1
+            return False
+        finally:
+            result.runtime += time.perf_counter() - start
+
+    def check_uncaught(matched_rows: list[tuple[int, EntityType, str]]):
+        for entity_type in {row[1] for row in matched_rows}:
+            type_rows = [row for row in matched_rows if row[1] == entity_type]
+            caught_ids = database.get_filter_matched_entity_ids([row[0] for row in type_rows], entity_type)
+            for entity_id, _, content in type_rows:
+                if entity_id in caught_ids:
+                    continue
+                result.uncaught_matches += 1
+                if len(result.uncaught_samples) < result.max_samples:
+                    result.uncaught_samples.append(content[:100])
+
+    matched_rows = []
+    for entity_id, entity_type, content in database.stream_corpus(CORPUS_CONTENT_TYPES[filter_type], max_items, chunk_size):
+        if is_out_of_time():
+            break
+        result.corpus_items += 1
+        if search(content):
+            result.corpus_matches += 1
+            matched_rows.append((entity_id, entity_type, content))
+        if len(matched_rows) >= chunk_size:
+            check_uncaught(matched_rows)
+            matched_rows = []
+    check_uncaught(matched_rows)
+    if result.partial:
+        return result
+    for (content,) in database.stream_filter_match_content(MATCH_FILTER_TYPES[filter_type], max_items, chunk_size):
+        if is_out_of_time():
+            break
+        result.filter_match_items += 1
+        if search(content):
+            result.filter_match_matches += 1
+    return result
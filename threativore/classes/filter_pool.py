@@ -0,0 +1,71 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+from threativore.classes.filterset import FilterSet, FilterStats, get_match_text
+from threativore.enums import FilterType
+
+# Each worker process compiles its own copy of the FilterSet when it starts
+_worker_filter_set: FilterSet | None = None
+
+
+def _init_worker(filter_rows: list[dict], version: int, timeout: float | None):
+    global _worker_filter_set
+    # The stats of the worker only log the evaluations, for the main process to replay into its own stats
+    _worker_filter_set = FilterSet(
+        [SimpleNamespace(**row) for row in filter_rows],
+        version,
+        FilterStats(log_evaluations=True),
+        timeout,
+    )
+
+
+def _match_batch(batch: list[tuple[int, dict[FilterType, list[str]]]]):
+    """Evaluates every candidate filter against the texts of each entity.
+    Returns what each (filter_id, text) pair matched, or None, per entity ID,
+    along with the evaluations and timeouts logged while doing so."""
+    results = {}
+    for entity_id, texts in batch:
+        candidate_ids = _worker_filter_set.get_candidate_ids(texts)
+        entity_matches = {}
+        for url in texts.get(FilterType.URL, []):
+            entity_matches.update(_worker_filter_set.get_domain_matches(url))
+        for filter_type, type_texts in texts.items():
+            for tfilter in _worker_filter_set.filters_by_type[filter_type]:
+                if tfilter.id not in candidate_ids:
+                    continue
+                for text in type_texts:
+                    if (tfilter.id, text) not in entity_matches:
+                        entity_matches[(tfilter.id, text)] = get_match_text(tfilter.search(text))
+        results[entity_id] = entity_matches
+    return results, _worker_filter_set.stats.pop_log()
+
+
+class FilterPool:
+    """Worker processes which evaluate filters on batches of entities, so that catching up on a big backlog
+    does not keep the GIL away from the API threads. The main thread then takes the actions based on their results.
+    The workers are spawned rather than forked, as we start them from a thread of a process full of other threads.
+    They get the plain filter rows and compile their own FilterSet from them."""
+
+    batch_size: int = 10
+
+    def __init__(self, filter_set: FilterSet, workers: int, stats: FilterStats):
+        self.version = filter_set.version
+        self.stats = stats
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(filter_set.get_rows(), filter_set.version, filter_set.timeout),
+        )
+
+    def match(self, entities: list[tuple[int, dict[FilterType, list[str]]]]) -> dict[int, dict[tuple[int, str], str | None]]:
+        batches = [entities[i:i + self.batch_size] for i in range(0, len(entities), self.batch_size)]
+        pooled_matches = {}
+        for batch_results, (evaluation_log, timeout_log) in self.executor.map(_match_batch, batches):
+            pooled_matches.update(batch_results)
+            self.stats.replay(evaluation_log, timeout_log)
+        return pooled_matches
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
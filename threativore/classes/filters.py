@@ -1,3 +1,5 @@
+import time
+from concurrent.futures.process import BrokenProcessPool
 from typing import Any
 
 import regex as re
@@ -5,15 +7,137 @@ from loguru import logger
 
 import threativore.database as database
 import threativore.exceptions as e
+from threativore import utils
+from threativore.config import Config
 from threativore.enums import FilterAction, FilterType, UserRoleTypes, AppealStatus
 from threativore.flask import db
-from threativore.orm.filters import Filter, FilterAppeal
+from threativore.orm.filters import Filter, FilterAppeal, FilterStat
+from threativore.classes.filterset import FilterSet, FilterStats
+from threativore.classes.filter_pool import FilterPool
+from threativore.classes.backtest import run_backtest
+from threativore.classes.regex_analyzer import analyze_regex
 
 class ThreativoreFilters:
     threativore = None
+    # Bumped every time a filter is changed, so that we know when to recompile the FilterSet
+    filters_version: int = 0
+    filter_set: FilterSet | None = None
+    filter_pool: FilterPool | None = None
+    # Columns of the filter_stats table which the stats can be sorted by
+    stats_sort_columns = {
+        "runtime": "total_runtime",
+        "p99": "p99_runtime",
+        "evaluations": "evaluations",
+        "matches": "matches",
+        "timeouts": "timeouts",
+    }
     
     def __init__(self, threativore):
         self.threativore = threativore
+        self.filter_stats = FilterStats()
+        self.last_stats_flush = time.monotonic()
+        self.last_reorder = time.monotonic()
+
+    def get_filter_set(self) -> FilterSet:
+        if self.filter_set is None or self.filter_set.version != self.filters_version:
+            self.filter_set = FilterSet(
+                database.get_enabled_filters(),
+                self.filters_version,
+                stats=self.filter_stats,
+                timeout=Config.filter_regex_timeout,
+            )
+            logger.debug(f"Compiled {len(self.filter_set)} filters for version {self.filters_version}")
+            self.last_reorder = time.monotonic()
+        elif time.monotonic() - self.last_reorder > Config.filter_reorder_interval:
+            self.filter_set.reorder(self.filter_stats.get_scores())
+            self.last_reorder = time.monotonic()
+        return self.filter_set
+
+    def match_in_pool(self, filter_set: FilterSet, entities: list[tuple[int, dict[FilterType, list[str]]]]) -> dict:
+        """Evaluates the filters for these entities in the FilterPool, if it's enabled and they're enough to be worth it.
+        Returns an empty dict otherwise, in which case the caller evaluates the filters itself."""
+        if Config.filter_pool_workers < 1 or len(entities) < Config.filter_pool_threshold:
+            return {}
+        if self.filter_pool is not None and self.filter_pool.version != filter_set.version:
+            self.filter_pool.shutdown()
+            self.filter_pool = None
+        if self.filter_pool is None:
+            self.filter_pool = FilterPool(filter_set, Config.filter_pool_workers, self.filter_stats)
+        try:
+            pooled_matches = self.filter_pool.match(entities)
+        except BrokenProcessPool as err:
+            logger.warning(f"Filter pool broke down. Will evaluate the filters in the main thread instead: {err}")
+            self.filter_pool.shutdown()
+            self.filter_pool = None
+            return {}
+        logger.debug(f"Evaluated the filters for {len(entities)} entities in {Config.filter_pool_workers} worker processes")
+        return pooled_matches
+
+    def quarantine_slow_filters(self):
+        """Filters which keep running out of time are switched to REPORT.
+        If they already were REPORT, they are disabled instead. Either way the admin gets a PM about it."""
+        for filter_id in self.filter_stats.get_timed_out_ids(Config.filter_timeout_strikes):
+            self.filter_stats.clear_strikes(filter_id)
+            tfilter = database.get_filter_by_id(filter_id)
+            if not tfilter or tfilter.disabled:
+                continue
+            if tfilter.filter_action != FilterAction.REPORT:
+                tfilter.filter_action = FilterAction.REPORT
+                quarantine_action = "switched to report-only"
+            else:
+                tfilter.disabled = True
+                quarantine_action = "disabled"
+            db.session.commit()
+            self.filters_version += 1
+            runtime = self.filter_stats.runtime.get(filter_id, 0.0)
+            logger.warning(f"Filter {filter_id} '{tfilter.regex}' kept timing out and has been {quarantine_action}")
+            self.threativore.reply_to_user_url(
+                user_url=Config.threativore_admin_url,
+                message=(
+                    f"Filter {filter_id} timed out {Config.filter_timeout_strikes} times "
+                    f"(limit {Config.filter_regex_timeout}s per text) and has been {quarantine_action}.\n\n"
+                    "---\n"
+                    f"* regex: `{tfilter.regex}`\n"
+                    f"* reason: {tfilter.reason}\n"
+                    f"* filter_type: {tfilter.filter_type.name}\n"
+                    f"* filter_scope: {tfilter.scope}\n"
+                    f"* cumulative runtime: {runtime:.2f}s\n\n"
+                    "Please modify its regex to avoid the timeouts."
+                ),
+            )
+
+    def flush_filter_stats(self, force: bool = False):
+        """Adds the counters gathered since the last flush to the filter_stats table, in a single commit"""
+        if not force and time.monotonic() - self.last_stats_flush < Config.filter_stats_flush_interval:
+            return
+        self.last_stats_flush = time.monotonic()
+        unflushed = self.filter_stats.pop_unflushed()
+        if not unflushed:
+            return
+        # Filters deleted since they were evaluated are not returned
+        for tfilter in database.get_filters_with_stats(list(unflushed)):
+            evaluations, matches, timeouts, runtime = unflushed[tfilter.id]
+            if tfilter.stats is None:
+                tfilter.stats = FilterStat(evaluations=0, matches=0, timeouts=0, total_runtime=0)
+            tfilter.stats.evaluations += evaluations
+            tfilter.stats.matches += matches
+            tfilter.stats.timeouts += timeouts
+            tfilter.stats.total_runtime += runtime
+            tfilter.stats.p99_runtime = self.filter_stats.get_p99(tfilter.id) or 0
+        db.session.commit()
+        logger.debug(f"Flushed stats of {len(unflushed)} filters")
+
+    def check_regex_complexity(self, regex: str):
+        """Rejects regexes which would backtrack catastrophically on crafted texts,
+        before they get a chance to time out on every comment"""
+        if Config.filter_regex_check_budget <= 0:
+            return
+        analysis = analyze_regex(regex, Config.filter_regex_check_budget)
+        if analysis.findings and not analysis.is_dangerous:
+            logger.info(f"Filter regex '{regex}' contains {'; '.join(analysis.findings)} but performed fine against adversarial texts")
+        if analysis.is_dangerous:
+            logger.warning(f"Rejected filter regex '{regex}' as too complex")
+            raise e.ReplyException(analysis.get_explanation())
 
     def add_filter(
         self,
@@ -24,12 +148,16 @@ class ThreativoreFilters:
         filter_type: FilterType,
         filter_scope: str,
         description: str | Any = None,
+        normalized: bool = False,
     ):
         user = database.get_user(user_url)
         if not user:
             raise e.ThreativoreException(f"{user_url} not known")
         if not user.has_role(UserRoleTypes.ADMIN) and not user.has_role(UserRoleTypes.MODERATOR):
             raise e.ThreativoreException(f"{user_url} doesn't have enough privileges to add filters")
+        if not utils.validate_regex(filter):
+            raise e.ReplyException(f"Invalid filter regex: `{filter}`")
+        self.check_regex_complexity(filter)
         existing_filter = database.get_filter(filter)
         if existing_filter and existing_filter.scope == filter_scope:
             raise e.ReplyException(f"Filter already exists: {existing_filter.regex} - {existing_filter.filter_type}")
@@ -44,9 +172,11 @@ class ThreativoreFilters:
             filter_action=filter_action,
             filter_type=filter_type,
             scope=filter_scope,
+            normalized=normalized,
         )
         db.session.add(new_filter)
         db.session.commit()
+        self.filters_version += 1
         logger.info(f"{user_url} just added {filter_type.name.lower()} filter '{filter}' with action {filter_action.name}")
 
     def remove_filter(self, existing_filter_id: str, user_url: str, filter_scope: str | None = None):
@@ -60,6 +190,7 @@ class ThreativoreFilters:
             return
         db.session.delete(existing_filter)
         db.session.commit()
+        self.filters_version += 1
 
     def modify_filter(
         self,
@@ -71,6 +202,7 @@ class ThreativoreFilters:
         filter_type: FilterType | None = None,
         filter_scope: str | None = None,
         description: str | None = None,
+        normalized: bool | None = None,
     ) -> Filter:
         user = database.get_user(user_url)
         if not user:
@@ -81,7 +213,13 @@ class ThreativoreFilters:
         if not existing_filter:
             raise e.ReplyException(f"filter ID {existing_filter_id} does not exist.")
         if new_filter_regex is not None:
+            if not utils.validate_regex(new_filter_regex):
+                raise e.ReplyException(f"Invalid filter regex: `{new_filter_regex}`")
+            self.check_regex_complexity(new_filter_regex)
             existing_filter.regex = new_filter_regex
+            # A new regex gets a fresh chance, in case it was quarantined for timing out
+            existing_filter.disabled = False
+            self.filter_stats.clear_strikes(existing_filter.id)
         if reason is not None:
             existing_filter.reason = reason
         if filter_action is not None:
@@ -90,7 +228,10 @@ class ThreativoreFilters:
             existing_filter.filter_type = filter_type
         if description is not None:
             existing_filter.description = description
+        if normalized is not None:
+            existing_filter.normalized = normalized
         db.session.commit()
+        self.filters_version += 1
         return existing_filter
 
     def print_all_filters(self):
@@ -120,6 +261,10 @@ class ThreativoreFilters:
             if filter_action_search:
                 filter_action = FilterAction[filter_action_search.group(1).upper()]
             filter_scope_search = re.search(rf"scope: ?`([^`]+)`", pm["private_message"]["content"], re.IGNORECASE)
+            filter_normalized_search = re.search(r"normali[sz]ed: ?`(true|false|yes|no)`", pm["private_message"]["content"], re.IGNORECASE)
+            filter_normalized = None
+            if filter_normalized_search:
+                filter_normalized = filter_normalized_search.group(1).lower() in ["true", "yes"]
             if filter_method == "add":
                 filter_scope = 'global'
                 if filter_scope_search:
@@ -129,6 +274,8 @@ class ThreativoreFilters:
                 filter_reason = filter_reason_search.group(1).strip()
                 if filter_action is None:
                     filter_action = FilterAction.REMOVE
+                if filter_normalized is None:
+                    filter_normalized = False
                 # logger.info([filter_type,filter_regex,filter_reason,filter_description,filter_action])
                 self.add_filter(
                     filter=filter_regex,
@@ -138,6 +285,7 @@ class ThreativoreFilters:
                     filter_type=filter_type,
                     filter_scope=filter_scope,
                     description=filter_description,
+                    normalized=filter_normalized,
                 )
                 self.threativore.reply_to_pm(
                     pm=pm,
@@ -149,6 +297,7 @@ class ThreativoreFilters:
                         f"* filter_action: {filter_action.name}\n"
                         f"* filter_type: {filter_type.name}\n"
                         f"* filter_scope: {filter_scope}\n"
+                        f"* normalized: {filter_normalized}\n"
                         f"* description: {filter_description}"
                     ),
                 )
@@ -172,6 +321,7 @@ class ThreativoreFilters:
                     filter_type=filter_type,
                     filter_scope=filter_scope,
                     description=filter_description,
+                    normalized=filter_normalized,
                 )
                 self.threativore.reply_to_pm(
                     pm=pm,
@@ -182,6 +332,7 @@ class ThreativoreFilters:
                         f"* reason: {modified_filter.reason}\n"
                         f"* filter_action: {modified_filter.filter_action.name}\n"
                         f"* filter_type: {modified_filter.filter_type.name}\n"
+                        f"* normalized: {modified_filter.normalized}\n"
                         f"* description: {modified_filter.description}"
                     ),
                 )
@@ -206,6 +357,8 @@ class ThreativoreFilters:
                     f"* filter_action: {ffilter.filter_action.name}\n"
                     f"* description: {ffilter.description}"
                 )
+                if ffilter.disabled:
+                    filters_string += "\n* disabled: True"
 
             self.threativore.reply_to_pm(
                 pm=pm,
@@ -229,3 +382,81 @@ class ThreativoreFilters:
             pm=pm,
             message=(f"Here are all the available {filter_type.name} filter regexp:\n\n\n" "---\n" f"* `{joined_filters}`"),
         )
+
+    def parse_filter_stats_pm(self, filter_stats_search, pm):
+        requesting_user = database.get_user(pm["creator"]["actor_id"].lower())
+        if not requesting_user:
+            raise e.ReplyException("Sorry, you do not have enough rights to do a filtering operation.")
+        if not requesting_user.can_do_filters():
+            raise e.ReplyException("Sorry, you do not have enough rights to do a filtering operation.")
+        sort_by = "runtime"
+        if filter_stats_search.group(1):
+            sort_by = filter_stats_search.group(1).lower()
+        self.flush_filter_stats(force=True)
+        all_stats = database.get_filter_stats(sort_by=self.stats_sort_columns[sort_by])
+        if len(all_stats) == 0:
+            self.threativore.reply_to_pm(pm=pm, message="No filter has been evaluated yet.")
+            return
+        stats_string = ""
+        for stat in all_stats:
+            stats_string += (
+                f"* {stat.filter_id}: `{stat.filter.regex}` - "
+                f"{stat.evaluations} evaluations, {stat.matches} matches, {stat.timeouts} timeouts, "
+                f"{stat.total_runtime:.2f}s total, {stat.p99_runtime * 1000:.2f}ms p99\n"
+            )
+        self.threativore.reply_to_pm(
+            pm=pm,
+            message=(f"Here are the top {len(all_stats)} filters by {sort_by}:\n\n\n" "---\n" f"{stats_string}"),
+        )
+
+    def parse_backtest_pm(self, backtest_search, pm):
+        requesting_user = database.get_user(pm["creator"]["actor_id"].lower())
+        if not requesting_user:
+            raise e.ReplyException("Sorry, you do not have enough rights to do a filtering operation.")
+        if not requesting_user.can_do_filters():
+            raise e.ReplyException("Sorry, you do not have enough rights to do a filtering operation.")
+        filter_type = FilterType[backtest_search.group(1).upper()]
+        filter_regex = backtest_search.group(2).strip()
+        # An existing filter ID can be provided to backtest it as it is, or with a modified regex
+        if filter_regex.isdigit():
+            existing_filter = database.get_filter_by_id(filter_regex)
+            if not existing_filter:
+                raise e.ReplyException(f"filter ID {filter_regex} does not exist.")
+            filter_regex = existing_filter.regex
+            new_filter_search = re.search(r"new[ _]filter: ?`(.+?)`[ \n]*?", pm["private_message"]["content"], re.IGNORECASE)
+            if new_filter_search:
+                filter_regex = new_filter_search.group(1).strip()
+        if not utils.validate_regex(filter_regex):
+            raise e.ReplyException(f"Invalid filter regex: `{filter_regex}`")
+        self.check_regex_complexity(filter_regex)
+        result = run_backtest(
+            regex=filter_regex,
+            filter_type=filter_type,
+            max_items=Config.backtest_max_items,
+            chunk_size=Config.backtest_chunk_size,
+            timeout=Config.filter_regex_timeout,
+            time_budget=Config.backtest_time_budget,
+        )
+        samples_string = ""
+        if result.uncaught_samples:
+            joined_samples = "`\n* `".join(result.uncaught_samples)
+            samples_string = f"\n\nSome of the matches no filter caught:\n\n* `{joined_samples}`"
+        partial_string = ""
+        if result.partial:
+            partial_string = f"\n\nThe backtest ran out of its {Config.backtest_time_budget}s budget, so these counts only cover part of the texts."
+        self.threativore.reply_to_pm(
+            pm=pm,
+            message=(
+                f"Backtest of {filter_type.name} filter `{filter_regex}` against {result.items} items:\n\n\n"
+                "---\n"
+                f"* recently scanned texts: {result.corpus_items}\n"
+                f"* matches among them: {result.corpus_matches}\n"
+                f"* of which no filter caught at the time: {result.uncaught_matches}\n"
+                f"* past filter matches: {result.filter_match_items}\n"
+                f"* matches among them: {result.filter_match_matches}\n"
+                f"* timeouts: {result.timeouts}\n"
+                f"* time per item: {result.time_per_item * 1000000:.1f}µs ({result.runtime:.2f}s total)"
+                f"{samples_string}"
+                f"{partial_string}"
+            ),
+        )
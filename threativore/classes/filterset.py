@@ -0,0 +1,566 @@
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+import ahocorasick
+import regex as re
+from loguru import logger
+
+from threativore.enums import FilterAction, FilterType
+from threativore.normalization import get_normalized_text
+
+# Literals shorter than this match too much text to be worth using as a prefilter
+MIN_LITERAL_LENGTH = 3
+# Escapes which stand for a single character class or an assertion. Any other alphanumeric escape
+# (\x41, \p{L}, \N{...}, backreferences etc) makes us give up on extracting literals.
+SIMPLE_ESCAPES = set("dDwWsSbBAZzGntrfvae")
+QUANTIFIER_SEARCH = re.compile(r"\{(\d*)(?:,(\d*))?\}")
+GLOBAL_FLAGS_SEARCH = re.compile(r"\(\?[a-zA-Z^-]+\)")
+COMMUNITY_SCOPE_SEARCH = re.compile(r"community::(\w+)", re.IGNORECASE)
+# URL filters which are nothing but a domain, like `example\.com` or `spam.example.com`
+DOMAIN_FILTER_MATCH = re.compile(r"(?:[a-z0-9-]+\\?\.)+[a-z0-9-]+", re.IGNORECASE)
+
+
+def get_filter_domain(tfilter) -> str | None:
+    """Returns the domain this filter is blocking, if it's a URL filter made up of just a domain"""
+    if tfilter.filter_type != FilterType.URL or tfilter.normalized:
+        return None
+    if not DOMAIN_FILTER_MATCH.fullmatch(tfilter.regex):
+        return None
+    return tfilter.regex.replace("\\", "").lower()
+
+
+def get_hostname_suffixes(url: str) -> list[str]:
+    """Returns the hostname of the URL followed by each of its parent domains, e.g. a.example.com, example.com and com"""
+    try:
+        hostname = urlparse(url).hostname
+    except ValueError:
+        return []
+    if not hostname:
+        return []
+    labels = hostname.rstrip(".").split(".")
+    return [".".join(labels[i:]) for i in range(len(labels))]
+
+
+def _skip_class(regex: str, i: int) -> int:
+    """Receives the index of a '[' and returns the index right after its closing ']'"""
+    i += 1
+    if i < len(regex) and regex[i] == "^":
+        i += 1
+    # A ']' right at the start is a literal
+    if i < len(regex) and regex[i] == "]":
+        i += 1
+    while i < len(regex):
+        if regex[i] == "\\":
+            i += 2
+            continue
+        if regex.startswith("[:", i):
+            end = regex.find(":]", i + 2)
+            if end != -1:
+                i = end + 2
+                continue
+        if regex[i] == "]":
+            return i + 1
+        i += 1
+    return i
+
+
+def _skip_group(regex: str, i: int) -> int:
+    """Receives the index of a '(' and returns the index right after its matching ')'"""
+    depth = 0
+    while i < len(regex):
+        if regex[i] == "\\":
+            i += 2
+            continue
+        if regex[i] == "[":
+            i = _skip_class(regex, i)
+            continue
+        if regex[i] == "(":
+            depth += 1
+        elif regex[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+def _split_alternatives(regex: str) -> list[str]:
+    alternatives = []
+    start = 0
+    i = 0
+    while i < len(regex):
+        if regex[i] == "\\":
+            i += 2
+        elif regex[i] == "[":
+            i = _skip_class(regex, i)
+        elif regex[i] == "(":
+            i = _skip_group(regex, i)
+        elif regex[i] == "|":
+            alternatives.append(regex[start:i])
+            i += 1
+            start = i
+        else:
+            i += 1
+    alternatives.append(regex[start:])
+    return alternatives
+
+
+def _get_longest_literal(alternative: str) -> str | None:
+    """Returns the longest run of plain characters which every match of this alternative has to contain"""
+    runs = []
+    current_run = ""
+    i = 0
+    while i < len(alternative):
+        c = alternative[i]
+        literal = None
+        if c == "\\":
+            if i + 1 >= len(alternative):
+                return None
+            escaped = alternative[i + 1]
+            if escaped.isalnum():
+                if escaped not in SIMPLE_ESCAPES:
+                    return None
+            else:
+                literal = escaped
+            i += 2
+        elif c == "[":
+            i = _skip_class(alternative, i)
+        elif c == "(":
+            i = _skip_group(alternative, i)
+        elif c in ".^$":
+            i += 1
+        elif c in "*?+{":
+            quantifier_match = QUANTIFIER_SEARCH.match(alternative, i)
+            # Could be a literal brace, but also a fuzzy matching constraint
+            if c == "{" and not quantifier_match:
+                return None
+            # The previous character might appear zero times, so it's not required after all
+            if c in "*?" or (quantifier_match and not quantifier_match.group(1).strip("0")):
+                current_run = current_run[:-1]
+            i = quantifier_match.end() if quantifier_match else i + 1
+            # Lazy and possessive quantifier suffixes
+            if i < len(alternative) and alternative[i] in "?+":
+                i += 1
+            runs.append(current_run)
+            current_run = ""
+            continue
+        else:
+            # We only trust casefolding for ASCII characters
+            if c.isascii():
+                literal = c
+            i += 1
+        if literal is None:
+            runs.append(current_run)
+            current_run = ""
+            continue
+        # A quantifier following this character applies only to it, which we handle on the next iteration
+        current_run += literal
+    runs.append(current_run)
+    longest_literal = max(runs, key=len)
+    if len(longest_literal) < MIN_LITERAL_LENGTH:
+        return None
+    return longest_literal.casefold()
+
+
+def fold_case(text: str) -> str:
+    """Casefolds the text the way the regex engine compares it under IGNORECASE.
+    Casefold turns 'İ' into 'i' plus a combining dot, while the regex engine treats it as a plain 'i'."""
+    return text.casefold().replace("i\u0307", "i")
+
+
+def extract_required_literals(regex: str) -> list[str] | None:
+    """Analyses a regex and returns a list of literals, one of which has to appear in any text this regex matches.
+    Returns None when we cannot be certain, in which case the regex always has to be evaluated."""
+    if GLOBAL_FLAGS_SEARCH.search(regex):
+        return None
+    literals = []
+    for alternative in _split_alternatives(regex):
+        literal = _get_longest_literal(alternative)
+        if literal is None:
+            return None
+        literals.append(literal)
+    return literals
+
+
+def get_match_text(filter_match) -> str | None:
+    """The part of the text a filter matched, which is what we log and report.
+    Domain filters already return the hostname they matched."""
+    if filter_match is None or isinstance(filter_match, str):
+        return filter_match
+    # An empty match is still a match, so it must not come out falsy
+    return filter_match.group() or repr(filter_match.group())
+
+
+class FilterStats:
+    """In-memory evaluation counters per filter ID.
+    These are owned by ThreativoreFilters rather than the FilterSet, so that they survive recompilations.
+    The totals count from the start of the process. pop_unflushed() gives what changed since it was last called.
+    The FilterPool workers also log each evaluation, so that the main process can replay them into its own stats."""
+
+    # How many of the latest evaluation times we keep per filter to estimate its p99
+    max_samples: int = 1000
+    # How much of the previous estimate survives each new evaluation, in the decayed hit rate and cost
+    score_decay: float = 0.98
+
+    def __init__(self, log_evaluations: bool = False):
+        self.evaluations: dict[int, int] = {}
+        self.matches: dict[int, int] = {}
+        self.timeouts: dict[int, int] = {}
+        self.runtime: dict[int, float] = {}
+        self.samples: dict[int, deque[float]] = {}
+        self.hit_rate: dict[int, float] = {}
+        self.cost: dict[int, float] = {}
+        # Timeouts since the filter was last quarantined or modified
+        self.timeout_strikes: dict[int, int] = {}
+        self._flushed: dict[int, tuple[int, int, int, float]] = {}
+        self.log_evaluations = log_evaluations
+        self.evaluation_log: list[tuple[int, float, bool]] = []
+        self.timeout_log: list[int] = []
+
+    def record_evaluation(self, filter_id: int, seconds: float, matched: bool):
+        if self.log_evaluations:
+            self.evaluation_log.append((filter_id, seconds, matched))
+        self.evaluations[filter_id] = self.evaluations.get(filter_id, 0) + 1
+        if matched:
+            self.matches[filter_id] = self.matches.get(filter_id, 0) + 1
+        self.runtime[filter_id] = self.runtime.get(filter_id, 0.0) + seconds
+        if filter_id not in self.samples:
+            self.samples[filter_id] = deque(maxlen=self.max_samples)
+        self.samples[filter_id].append(seconds)
+        if filter_id not in self.hit_rate:
+            self.hit_rate[filter_id] = float(matched)
+            self.cost[filter_id] = seconds
+        else:
+            self.hit_rate[filter_id] = self.hit_rate[filter_id] * self.score_decay + float(matched) * (1 - self.score_decay)
+            self.cost[filter_id] = self.cost[filter_id] * self.score_decay + seconds * (1 - self.score_decay)
+
+    def record_timeout(self, filter_id: int):
+        if self.log_evaluations:
+            self.timeout_log.append(filter_id)
+        self.timeouts[filter_id] = self.timeouts.get(filter_id, 0) + 1
+        self.timeout_strikes[filter_id] = self.timeout_strikes.get(filter_id, 0) + 1
+
+    def get_timed_out_ids(self, strikes: int) -> list[int]:
+        """Returns the IDs of the filters which have timed out at least this many times"""
+        return [filter_id for filter_id, timeouts in self.timeout_strikes.items() if timeouts >= strikes]
+
+    def clear_strikes(self, filter_id: int):
+        self.timeout_strikes.pop(filter_id, None)
+
+    def get_p99(self, filter_id: int) -> float | None:
+        """The 99th percentile of the latest evaluation times of this filter"""
+        if not self.samples.get(filter_id):
+            return None
+        samples = sorted(self.samples[filter_id])
+        return samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+    def get_scores(self) -> dict[int, float]:
+        """Returns how likely each filter is to match, per second it takes to run"""
+        return {
+            filter_id: hit_rate / max(self.cost[filter_id], 1e-9)
+            for filter_id, hit_rate in self.hit_rate.items()
+        }
+
+    def pop_log(self) -> tuple[list[tuple[int, float, bool]], list[int]]:
+        """Returns the (filter_id, seconds, matched) evaluations and the timed out filter IDs logged since the previous call"""
+        evaluation_log, timeout_log = self.evaluation_log, self.timeout_log
+        self.evaluation_log, self.timeout_log = [], []
+        return evaluation_log, timeout_log
+
+    def replay(self, evaluation_log: list[tuple[int, float, bool]], timeout_log: list[int]):
+        """Records evaluations which happened elsewhere, in the format returned by pop_log()"""
+        for filter_id, seconds, matched in evaluation_log:
+            self.record_evaluation(filter_id, seconds, matched)
+        for filter_id in timeout_log:
+            self.record_timeout(filter_id)
+
+    def pop_unflushed(self) -> dict[int, tuple[int, int, int, float]]:
+        """Returns the (evaluations, matches, timeouts, runtime) accumulated per filter since the previous call"""
+        unflushed = {}
+        for filter_id, evaluations in self.evaluations.items():
+            current = (evaluations, self.matches.get(filter_id, 0), self.timeouts.get(filter_id, 0), self.runtime.get(filter_id, 0.0))
+            previous = self._flushed.get(filter_id, (0, 0, 0, 0.0))
+            if current == previous:
+                continue
+            unflushed[filter_id] = tuple(c - p for c, p in zip(current, previous))
+            self._flushed[filter_id] = current
+        return unflushed
+
+
+class CompiledFilter:
+    """A detached copy of a Filter row with its regex already compiled.
+    We keep these around between DB sessions, so they must never lazy-load anything."""
+
+    def __init__(self, tfilter, stats: FilterStats | None = None, timeout: float | None = None):
+        self.id: int = tfilter.id
+        self.regex: str = tfilter.regex
+        self.reason: str = tfilter.reason
+        self.description: str = tfilter.description
+        self.filter_action: FilterAction = tfilter.filter_action
+        self.filter_type: FilterType = tfilter.filter_type
+        self.scope: str = tfilter.scope
+        # Normalized filters run against the text after get_normalized_text()
+        self.normalized: bool = tfilter.normalized
+        self.pattern = re.compile(tfilter.regex, re.IGNORECASE)
+        self.literals: list[str] | None = extract_required_literals(tfilter.regex)
+        self.domain: str | None = get_filter_domain(tfilter)
+        self.stats: FilterStats = stats if stats is not None else FilterStats()
+        self.timeout: float | None = timeout
+
+    def get_row(self) -> dict:
+        """The fields this was compiled from, as a plain dict which can be sent to another process"""
+        return {
+            "id": self.id,
+            "regex": self.regex,
+            "reason": self.reason,
+            "description": self.description,
+            "filter_action": self.filter_action,
+            "filter_type": self.filter_type,
+            "scope": self.scope,
+            "normalized": self.normalized,
+        }
+
+    def search(self, text: str):
+        """A filter which runs out of time counts as not matching, as we'd rather miss some spam than stall the loop.
+        Domain filters only match URLs on that domain or its subdomains, and return the hostname they matched."""
+        if self.domain:
+            start = time.perf_counter()
+            hostname_suffixes = get_hostname_suffixes(text)
+            filter_match = hostname_suffixes[0] if self.domain in hostname_suffixes else None
+            self.stats.record_evaluation(self.id, time.perf_counter() - start, filter_match is not None)
+            return filter_match
+        if self.normalized:
+            text = get_normalized_text(text)
+        filter_match = None
+        start = time.perf_counter()
+        try:
+            filter_match = self.pattern.search(text, timeout=self.timeout)
+        except TimeoutError:
+            self.stats.record_timeout(self.id)
+            logger.warning(f"Filter {self.id} '{self.regex}' timed out after {self.timeout}s on a text of {len(text)} characters")
+        self.stats.record_evaluation(self.id, time.perf_counter() - start, filter_match is not None)
+        return filter_match
+
+
+class LiteralMatcher:
+    """Sweeps a text once with an Aho-Corasick automaton of the literals required by each filter,
+    to find which filters can possibly match it."""
+
+    def __init__(self, filters: list[CompiledFilter]):
+        self.automaton = ahocorasick.Automaton()
+        for tfilter in filters:
+            for literal in tfilter.literals:
+                if literal in self.automaton:
+                    self.automaton.get(literal).add(tfilter.id)
+                else:
+                    self.automaton.add_word(literal, {tfilter.id})
+        if len(self.automaton):
+            self.automaton.make_automaton()
+
+    def get_candidate_ids(self, text: str) -> set[int]:
+        candidate_ids = set()
+        if not len(self.automaton):
+            return candidate_ids
+        for _, filter_ids in self.automaton.iter(fold_case(text)):
+            candidate_ids |= filter_ids
+        return candidate_ids
+
+
+class CombinedMatcher:
+    """Merges the patterns of many filters into a single alternation, so that a text is scanned only once.
+    A text which does not match the alternation cannot match any of the merged filters.
+    Patterns which would change meaning once merged (numbered backreferences and conditionals, recursion, global inline flags)
+    are left out and always have to be evaluated on their own.
+
+    The regex module loses its literal-prefix search once patterns are merged, so the alternation
+    is only worth it on short texts like usernames. Longer texts just get all the filters as candidates."""
+
+    # Things which rely on group numbering or which leak into the other alternatives once merged.
+    unmergeable_search = re.compile(
+        r"\\[1-9]|\\g<|\(\?P[=>]|\(\?&|\(\?[0-9R+-]|\(\?[a-zA-Z0-9^-]*\)|\(\?\(\d|\(\?\(<?\w+>?\)"
+    )
+    # Above this length, running each pattern on its own is faster than running the merged one
+    max_scan_length: int = 32
+
+    def __init__(self, filters: list[CompiledFilter], timeout: float | None = None):
+        self.timeout = timeout
+        self.unmerged_ids: set[int] = set()
+        self.merged_ids: set[int] = set()
+        self.pattern = None
+        alternatives = []
+        for tfilter in filters:
+            if not self.is_mergeable(tfilter.regex):
+                self.unmerged_ids.add(tfilter.id)
+                continue
+            alternatives.append(f"(?P<_filter_{tfilter.id}>{tfilter.regex})")
+            self.merged_ids.add(tfilter.id)
+        if not alternatives:
+            return
+        try:
+            self.pattern = re.compile("|".join(alternatives), re.IGNORECASE)
+        except re.error as err:
+            logger.warning(f"Could not merge filter patterns. Will evaluate them one by one: {err}")
+            self.unmerged_ids |= self.merged_ids
+            self.merged_ids = set()
+
+    @classmethod
+    def is_mergeable(cls, regex: str) -> bool:
+        if cls.unmergeable_search.search(regex):
+            return False
+        try:
+            re.compile(f"(?P<_filter_0>{regex})", re.IGNORECASE)
+        except re.error:
+            return False
+        return True
+
+    def get_candidate_ids(self, text: str) -> set[int]:
+        """Returns the IDs of the filters which might match this text"""
+        if len(text) > self.max_scan_length:
+            return self.merged_ids | self.unmerged_ids
+        try:
+            if self.pattern is not None and self.pattern.search(text, timeout=self.timeout):
+                return self.merged_ids | self.unmerged_ids
+        except TimeoutError:
+            # Each filter will run against its own time budget instead
+            return self.merged_ids | self.unmerged_ids
+        return self.unmerged_ids
+
+
+class FilterSet:
+    """All the filters compiled once and grouped by their FilterType.
+    Each group is sorted by filter_action so that the scanning loops can just walk them in order.
+    Within the same filter_action, the filters most likely to match for the least runtime come first.
+    Filters we have no scores for yet come first of all, so that we learn about them."""
+
+    def __init__(self, filters: list, version: int = 0, stats: FilterStats | None = None, timeout: float | None = None):
+        self.version = version
+        self.stats: FilterStats = stats if stats is not None else FilterStats()
+        self.scores: dict[int, float] = self.stats.get_scores()
+        self.timeout: float | None = timeout
+        self.filters_by_type: dict[FilterType, list[CompiledFilter]] = {ft: [] for ft in FilterType}
+        for tfilter in filters:
+            try:
+                compiled_filter = CompiledFilter(tfilter, self.stats, timeout)
+            except re.error as err:
+                logger.warning(f"Skipping filter {tfilter.id} as its regex '{tfilter.regex}' does not compile: {err}")
+                continue
+            self.filters_by_type[compiled_filter.filter_type].append(compiled_filter)
+        for filter_list in self.filters_by_type.values():
+            filter_list.sort(key=self._sort_key)
+        # Domain filters only ever match hostnames, so instead of going through the matchers they're looked up here
+        self.domain_filters: dict[str, list[int]] = {}
+        for tfilter in self.filters_by_type[FilterType.URL]:
+            if tfilter.domain:
+                self.domain_filters.setdefault(tfilter.domain, []).append(tfilter.id)
+        # The types which have filters opting into normalization, so that we only normalize texts when needed
+        self.normalized_types: set[FilterType] = {
+            filter_type for filter_type, filter_list in self.filters_by_type.items() if any(f.normalized for f in filter_list)
+        }
+        self.global_filters: list[CompiledFilter] = []
+        self.instance_filters: list[CompiledFilter] = []
+        self.community_filters: dict[str, list[CompiledFilter]] = {}
+        for filter_list in self.filters_by_type.values():
+            for tfilter in filter_list:
+                if tfilter.scope == "instance":
+                    self.instance_filters.append(tfilter)
+                    continue
+                community_scope_search = COMMUNITY_SCOPE_SEARCH.search(tfilter.scope)
+                # Filters with an unknown scope apply everywhere, same as global ones
+                if community_scope_search:
+                    self.community_filters.setdefault(community_scope_search.group(1), []).append(tfilter)
+                else:
+                    self.global_filters.append(tfilter)
+        self._merged_filters: dict[tuple[FilterType, ...], list[CompiledFilter]] = {}
+        self._scoped_filters: dict[tuple, list[CompiledFilter]] = {}
+        self._matchers: dict[tuple[FilterType, bool], tuple[LiteralMatcher, CombinedMatcher]] = {}
+
+    def _sort_key(self, tfilter: CompiledFilter) -> tuple[int, float]:
+        return (tfilter.filter_action.value, -self.scores.get(tfilter.id, float("inf")))
+
+    def reorder(self, scores: dict[int, float]):
+        """Re-sorts the filters within each filter_action by these scores, without recompiling anything"""
+        self.scores = scores
+        for filter_list in self.filters_by_type.values():
+            filter_list.sort(key=self._sort_key)
+        self._merged_filters = {}
+        self._scoped_filters = {}
+
+    def get_filters(self, *filter_types: FilterType, community: dict | None = None) -> list[CompiledFilter]:
+        """Returns the filters of all the requested types, sorted by filter_action.
+        Within the same action they are sorted by their learned score, regardless of their type,
+        with the filters which have no score yet first. Filters with equal scores keep the order of the requested types.
+        When a lemmy community is provided, only the filters whose scope applies to it are returned."""
+        if filter_types not in self._merged_filters:
+            merged_filters = []
+            for filter_type in filter_types:
+                merged_filters += self.filters_by_type[filter_type]
+            self._merged_filters[filter_types] = sorted(merged_filters, key=self._sort_key)
+        if community is None:
+            return self._merged_filters[filter_types]
+        # Community scopes are only ever checked against local communities
+        scope_key = (filter_types, community["local"], community["name"] if community["local"] else None)
+        if scope_key not in self._scoped_filters:
+            if community["local"]:
+                scoped_filters = self.global_filters + self.instance_filters + self.community_filters.get(community["name"], [])
+            else:
+                scoped_filters = self.global_filters + [f for filter_list in self.community_filters.values() for f in filter_list]
+            scoped_ids = {f.id for f in scoped_filters}
+            self._scoped_filters[scope_key] = [f for f in self._merged_filters[filter_types] if f.id in scoped_ids]
+        return self._scoped_filters[scope_key]
+
+    def get_matchers(self, filter_type: FilterType, normalized: bool = False) -> tuple[LiteralMatcher, CombinedMatcher]:
+        """Filters with required literals go through the LiteralMatcher. The rest through the CombinedMatcher.
+        Normalized filters get their own matchers, as they need to run against the normalized text."""
+        if (filter_type, normalized) not in self._matchers:
+            type_filters = [f for f in self.filters_by_type[filter_type] if f.normalized == normalized and not f.domain]
+            self._matchers[(filter_type, normalized)] = (
+                LiteralMatcher([f for f in type_filters if f.literals]),
+                CombinedMatcher([f for f in type_filters if not f.literals], self.timeout),
+            )
+        return self._matchers[(filter_type, normalized)]
+
+    def get_domain_matches(self, url: str) -> dict[tuple[int, str], str]:
+        """Looks up every suffix of the URL hostname in the domain filters.
+        Returns the hostname for each filter it matches, in the same format as the FilterPool results."""
+        if not self.domain_filters:
+            return {}
+        hostname_suffixes = get_hostname_suffixes(url)
+        domain_matches = {}
+        for suffix in hostname_suffixes:
+            for filter_id in self.domain_filters.get(suffix, []):
+                domain_matches[(filter_id, url)] = hostname_suffixes[0]
+        return domain_matches
+
+    def search(self, tfilter: CompiledFilter, text: str, pooled_matches: dict[tuple[int, str], str | None] | None = None):
+        """Evaluates the filter against the text, unless a FilterPool worker or the domain index has already done so"""
+        if pooled_matches is not None and (tfilter.id, text) in pooled_matches:
+            return pooled_matches[(tfilter.id, text)]
+        return tfilter.search(text)
+
+    def get_candidate_ids(self, texts: dict[FilterType, list[str]]) -> set[int]:
+        """Scans each text once per FilterType and returns the IDs of all the filters which might match.
+        Filters not returned here are guaranteed to not match, so the caller can skip them.
+        The ones returned still need to be evaluated in order, to discover the winning filter."""
+        candidate_ids = set()
+        for url in texts.get(FilterType.URL, []):
+            candidate_ids |= {filter_id for filter_id, _ in self.get_domain_matches(url)}
+        for filter_type, type_texts in texts.items():
+            literal_matcher, combined_matcher = self.get_matchers(filter_type)
+            for text in type_texts:
+                candidate_ids |= literal_matcher.get_candidate_ids(text)
+                candidate_ids |= combined_matcher.get_candidate_ids(text)
+            if filter_type not in self.normalized_types:
+                continue
+            literal_matcher, combined_matcher = self.get_matchers(filter_type, normalized=True)
+            for text in type_texts:
+                normalized_text = get_normalized_text(text)
+                candidate_ids |= literal_matcher.get_candidate_ids(normalized_text)
+                candidate_ids |= combined_matcher.get_candidate_ids(normalized_text)
+        return candidate_ids
+
+    def get_rows(self) -> list[dict]:
+        return [tfilter.get_row() for filter_list in self.filters_by_type.values() for tfilter in filter_list]
+
+    def __len__(self):
+        return sum(len(filter_list) for filter_list in self.filters_by_type.values())
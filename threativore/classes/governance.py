@@ -153,13 +153,17 @@ class Governance:
             more_votes = self.threativore.lemmy.post.list_votes(gpost.post_id, page=page).get("post_likes", [])
             page += 1
             votes += more_votes
+        # We fetch all voters along with their aliases at once, instead of doing a few queries per vote
+        voting_users = database.get_users_by_urls([v["creator"]["actor_id"].lower() for v in votes])
         for v in votes:
-            voting_user = database.get_user(v["creator"]["actor_id"].lower())
-            if self.is_admin(v["creator"]["actor_id"].lower()) and not voting_user:
-                voting_user = self.threativore.users.ensure_user_exists(v["creator"]["actor_id"].lower())
-            # If it's a confed user, this might be a known alias, so we check if we find one
-            if not voting_user and self.is_confed(v["creator"]["actor_id"].lower()):
-                voting_user = database.get_user_from_alias(v["creator"]["actor_id"].lower())
+            voter_url = v["creator"]["actor_id"].lower()
+            voting_user = voting_users.get(voter_url)
+            # Aliases only count for confed users, and admins always vote as themselves
+            if voting_user and voting_user.user_url != voter_url:
+                if self.is_admin(voter_url) or not self.is_confed(voter_url):
+                    voting_user = None
+            if self.is_admin(voter_url) and not voting_user:
+                voting_user = self.threativore.users.ensure_user_exists(voter_url)
             # If any alias of this user has already voted, we disregard potential multiple votes.
             if voting_user in valid_voted_set:
                 continue
@@ -282,14 +286,16 @@ class Governance:
         # return_string += f"\n\n --- \n\n*Reminder that this is a pilot process and results of voting are not set in stone.*"
         return return_string
 
-    def get_comment_flair(self, comment, show_all_flair: bool, redo_comment_flair: bool = False) -> str | None:
-        "Returns a comment_markdown if markdown is valid. Else returns None"
+    def get_comment_flair(self, comment, show_all_flair: bool, redo_comment_flair: bool = False, known_users: dict[str, User] | None = None) -> str | None:
+        "Returns a comment_markdown if markdown is valid. Else returns None. known_users can hold the already fetched commenters"
         user_url = comment["creator"]["actor_id"].lower()
         if user_url == self.threativore.threativore_user_url:
             return
         if not redo_comment_flair and database.replied_to_gpost_comment(comment["comment"]["id"]):
             return
-        comment_user: User = self.threativore.users.ensure_user_exists(user_url)
+        comment_user: User | None = known_users.get(user_url) if known_users else None
+        if not comment_user:
+            comment_user = self.threativore.users.ensure_user_exists(user_url)
         if show_all_flair:
             flair_markdown = ''.join(comment_user.get_all_flair_markdowns())
         else:
@@ -330,8 +336,12 @@ class Governance:
             post_id = gpost.post_id, 
             max_depth=1,
         )
+        commenters = database.get_users_by_urls(
+            [comment["creator"]["actor_id"].lower() for comment in comments],
+            resolve_aliases=False,
+        )
         for comment in comments:
-            flair_markdown = self.get_comment_flair(comment,show_all_flair, redo_all_comment_flair)
+            flair_markdown = self.get_comment_flair(comment,show_all_flair, redo_all_comment_flair, commenters)
             if flair_markdown is None:
                 continue
             if redo_all_comment_flair:
@@ -349,11 +359,13 @@ class Governance:
                     content = flair_markdown,
                     parent_id = comment["comment"]["id"]
                 )
+                commenter_url = comment["creator"]["actor_id"].lower()
+                commenter = commenters.get(commenter_url) or self.threativore.users.ensure_user_exists(commenter_url)
                 new_gpost_comment_reply = GovernancePostComment(
                     parent_id = comment["comment"]["id"],
                     comment_id = flair_comment["comment_view"]["comment"]["id"],
                     gpost_id = gpost.id,
-                    user_id = comment["creator"]["actor_id"].lower()
+                    user_id = commenter.id
                 )
                 db.session.add(new_gpost_comment_reply)
                 db.session.commit()        
@@ -429,13 +441,10 @@ class Governance:
             if args.refresh_all_gpost_comments is not None:
                 self.full_update_single_gpost(args.refresh_all_gpost_comments)
                 exit(0)
-            while True:
-                try:
-                    self.update_gposts()
-                    self.check_for_new_posts()
-                    time.sleep(15*60)
-                    self.update_admins()
-                except Exception as err:
-                    raise err
-                    logger.warning(f"Exception during loop: {err}. Will continue after sleep...")
-                    time.sleep(1)
+        while True:
+            # A fresh DB session per run, so that it doesn't hold on to the objects of every previous one
+            with APP.app_context():
+                self.update_gposts()
+                self.check_for_new_posts()
+            time.sleep(15*60)
+            self.update_admins()
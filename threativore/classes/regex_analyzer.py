@@ -0,0 +1,253 @@
+import string
+import time
+
+import regex as re
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+# Possessive quantifiers and atomic groups never backtrack into themselves. Only parsed by python 3.11+
+POSSESSIVE_REPEAT = getattr(sre_parse, "POSSESSIVE_REPEAT", None)
+ATOMIC_GROUP = getattr(sre_parse, "ATOMIC_GROUP", None)
+UNBOUNDED_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+# The characters we probe to see if two alternatives can start matching on the same one
+SAMPLE_CHARS = string.printable + "éßΩж٣ "
+CATEGORY_CHECKS = {
+    sre_parse.CATEGORY_DIGIT: lambda c: c.isdigit(),
+    sre_parse.CATEGORY_NOT_DIGIT: lambda c: not c.isdigit(),
+    sre_parse.CATEGORY_SPACE: lambda c: c.isspace(),
+    sre_parse.CATEGORY_NOT_SPACE: lambda c: not c.isspace(),
+    sre_parse.CATEGORY_WORD: lambda c: c.isalnum() or c == "_",
+    sre_parse.CATEGORY_NOT_WORD: lambda c: not (c.isalnum() or c == "_"),
+}
+# Repeated to build texts which make backtracking regexes try every way to split them, before failing on the last character
+ADVERSARIAL_SEEDS = ["a", "a ", "1", " ", "ab", "a1", "a.", "aA", "-", "\n"]
+ADVERSARIAL_SUFFIX = "\x00"
+NESTED_QUANTIFIER = "nested unbounded quantifiers, such as `(a+)+`"
+AMBIGUOUS_ALTERNATION = "alternatives which can start matching on the same character inside a repetition, such as `(\\d+|\\w+)*`"
+UNBOUNDED_BACKREFERENCE = "a backreference to a group of unbounded length, or a backreference inside a repetition"
+
+
+class RegexAnalysis:
+    """The outcome of checking a filter regex for catastrophic backtracking"""
+
+    # A regex found risky by the static checks is also rejected when the runtime grows this many times
+    # while the adversarial input length grows by small_length -> large_length. Linear growth would be 4.
+    max_growth: float = 8.0
+    # Below this runtime on the large inputs, the growth is considered noise
+    min_growth_runtime: float = 0.005
+    small_length: int = 500
+    large_length: int = 2000
+
+    def __init__(self, regex: str, budget: float):
+        self.regex = regex
+        self.budget = budget
+        self.findings: list[str] = []
+        # Regexes using syntax only the regex module knows cannot be statically analyzed. They still get timed.
+        self.parsed = True
+        # The seed and length of the adversarial text which ran out of time, if any
+        self.timed_out_seed: str | None = None
+        self.timed_out_length = 0
+        self.small_runtime = 0.0
+        self.large_runtime = 0.0
+
+    @property
+    def growth(self) -> float:
+        return self.large_runtime / max(self.small_runtime, 1e-9)
+
+    @property
+    def is_superlinear(self) -> bool:
+        return self.large_runtime >= self.min_growth_runtime and self.growth > self.max_growth
+
+    @property
+    def is_dangerous(self) -> bool:
+        if self.timed_out_seed is not None:
+            return True
+        return len(self.findings) > 0 and self.is_superlinear
+
+    def get_explanation(self) -> str:
+        lines = [f"Filter regex `{self.regex}` risks catastrophic backtracking and was rejected."]
+        if self.timed_out_seed is not None:
+            lines.append(
+                f"It took longer than {self.budget} seconds against a {self.timed_out_length}-character text "
+                f"made up of repeated {self.timed_out_seed!r}."
+            )
+        elif self.is_superlinear:
+            lines.append(
+                f"Its runtime grew {self.growth:.0f}x when the text grew {self.large_length // self.small_length}x "
+                f"(up to {self.large_runtime:.3f} seconds)."
+            )
+        if self.findings:
+            lines.append("It contains " + "; ".join(self.findings) + ".")
+        lines.append(
+            "Try bounding the quantifiers (e.g. `\\w{1,30}` instead of `\\w+`), "
+            "making them possessive (e.g. `\\w++`), or making the alternatives mutually exclusive."
+        )
+        return "\n\n".join(lines)
+
+
+def _get_first_atoms(items) -> tuple[list, bool]:
+    """Returns the atoms which can match the first character of the parsed items
+    and whether the items can match the empty string"""
+    atoms = []
+    for op, av in items:
+        if op == sre_parse.LITERAL:
+            atoms.append((op, av))
+            return atoms, False
+        if op == sre_parse.IN:
+            if any(set_op == sre_parse.NEGATE for set_op, _ in av):
+                atoms.append((sre_parse.ANY, None))
+            else:
+                atoms.extend(av)
+            return atoms, False
+        if op in {sre_parse.ANY, sre_parse.NOT_LITERAL, sre_parse.GROUPREF}:
+            atoms.append((sre_parse.ANY, None))
+            return atoms, False
+        if op in UNBOUNDED_REPEATS or op == POSSESSIVE_REPEAT:
+            min_repeat, _, body = av
+            body_atoms, nullable = _get_first_atoms(body)
+            atoms.extend(body_atoms)
+            if min_repeat > 0 and not nullable:
+                return atoms, False
+            continue
+        if op in {sre_parse.SUBPATTERN, ATOMIC_GROUP}:
+            body = av[-1] if op == sre_parse.SUBPATTERN else av
+            body_atoms, nullable = _get_first_atoms(body)
+            atoms.extend(body_atoms)
+            if not nullable:
+                return atoms, False
+            continue
+        if op == sre_parse.BRANCH:
+            nullable = False
+            for branch in av[1]:
+                branch_atoms, branch_nullable = _get_first_atoms(branch)
+                atoms.extend(branch_atoms)
+                nullable = nullable or branch_nullable
+            if not nullable:
+                return atoms, False
+            continue
+        # Anchors and lookarounds don't consume anything
+    return atoms, True
+
+
+def _atom_matches(atom, char: str) -> bool:
+    op, av = atom
+    if op == sre_parse.ANY:
+        return True
+    if op == sre_parse.LITERAL:
+        return chr(av).lower() == char.lower()
+    if op == sre_parse.RANGE:
+        return any(av[0] <= ord(c) <= av[1] for c in {char, char.lower(), char.upper()})
+    if op == sre_parse.CATEGORY:
+        check = CATEGORY_CHECKS.get(av)
+        return check is None or check(char)
+    return True
+
+
+def _alternatives_overlap(branches) -> bool:
+    branch_atoms = [_get_first_atoms(branch)[0] for branch in branches]
+    literal_chars = "".join(chr(av) for atoms in branch_atoms for op, av in atoms if op == sre_parse.LITERAL)
+    for char in SAMPLE_CHARS + literal_chars:
+        matching_branches = 0
+        for atoms in branch_atoms:
+            if any(_atom_matches(atom, char) for atom in atoms):
+                matching_branches += 1
+        if matching_branches > 1:
+            return True
+    return False
+
+
+def _is_unbounded(items) -> bool:
+    for op, av in items:
+        if op in UNBOUNDED_REPEATS or op == POSSESSIVE_REPEAT:
+            if av[1] == sre_parse.MAXREPEAT or _is_unbounded(av[2]):
+                return True
+        elif op == sre_parse.SUBPATTERN:
+            if _is_unbounded(av[-1]):
+                return True
+        elif op == ATOMIC_GROUP:
+            if _is_unbounded(av):
+                return True
+        elif op == sre_parse.BRANCH:
+            if any(_is_unbounded(branch) for branch in av[1]):
+                return True
+    return False
+
+
+def _find_risks(items, in_repeat: bool, unbounded_groups: set[int], findings: set[str]):
+    for op, av in items:
+        if op in UNBOUNDED_REPEATS:
+            _, max_repeat, body = av
+            unbounded = max_repeat == sre_parse.MAXREPEAT
+            if unbounded and in_repeat:
+                findings.add(NESTED_QUANTIFIER)
+            _find_risks(body, in_repeat or unbounded, unbounded_groups, findings)
+        elif op == sre_parse.SUBPATTERN:
+            group, body = av[0], av[-1]
+            _find_risks(body, in_repeat, unbounded_groups, findings)
+            if group is not None and _is_unbounded(body):
+                unbounded_groups.add(group)
+        elif op == sre_parse.BRANCH:
+            if in_repeat and _alternatives_overlap(av[1]):
+                findings.add(AMBIGUOUS_ALTERNATION)
+            for branch in av[1]:
+                _find_risks(branch, in_repeat, unbounded_groups, findings)
+        elif op == sre_parse.GROUPREF:
+            if in_repeat or av in unbounded_groups:
+                findings.add(UNBOUNDED_BACKREFERENCE)
+        elif op in {sre_parse.ASSERT, sre_parse.ASSERT_NOT}:
+            _find_risks(av[1], in_repeat, unbounded_groups, findings)
+        # Possessive repeats and atomic groups never backtrack into their contents, so we don't descend into them
+
+
+def get_static_findings(regex: str) -> list[str] | None:
+    """Looks for the constructs which can make a backtracking regex engine take exponential time.
+    Returns None if the regex uses syntax which the stdlib parser does not understand"""
+    try:
+        parsed = sre_parse.parse(regex, sre_parse.SRE_FLAG_IGNORECASE)
+    except Exception:
+        return None
+    findings = set()
+    _find_risks(parsed, False, set(), findings)
+    return sorted(findings)
+
+
+def get_adversarial_seeds(regex: str) -> list[str]:
+    """The generic seeds, along with the literal characters of the regex"""
+    seeds = list(ADVERSARIAL_SEEDS)
+    for char in dict.fromkeys(regex):
+        if char.isalnum() or char in string.punctuation:
+            if char not in "\\()[]{}|?*+^$" and char not in seeds:
+                seeds.append(char)
+    return seeds
+
+
+def analyze_regex(regex: str, budget: float) -> RegexAnalysis:
+    """Checks a filter regex statically for backtracking risks and times it against adversarial texts.
+    The regex is expected to compile."""
+    analysis = RegexAnalysis(regex, budget)
+    findings = get_static_findings(regex)
+    if findings is None:
+        analysis.parsed = False
+    else:
+        analysis.findings = findings
+    pattern = re.compile(regex, re.IGNORECASE)
+    for length in (analysis.small_length, analysis.large_length):
+        worst_runtime = 0.0
+        for seed in get_adversarial_seeds(regex):
+            text = seed * (length // len(seed)) + ADVERSARIAL_SUFFIX
+            start = time.perf_counter()
+            try:
+                pattern.search(text, timeout=budget)
+            except TimeoutError:
+                analysis.timed_out_seed = seed
+                analysis.timed_out_length = len(text)
+                return analysis
+            worst_runtime = max(worst_runtime, time.perf_counter() - start)
+        if length == analysis.small_length:
+            analysis.small_runtime = worst_runtime
+        else:
+            analysis.large_runtime = worst_runtime
+    return analysis
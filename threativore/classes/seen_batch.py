@@ -0,0 +1,50 @@
+import threativore.database as database
+from threativore.classes.seen_cache import SeenCache
+from threativore.config import Config
+from threativore.enums import EntityType, FilterType
+from threativore.flask import db
+
+
+class SeenBatch:
+    """Collects the seen and corpus rows of a page of entities, so that they're written with a single bulk insert
+    and a single commit, instead of one commit per entity.
+    If we crash before flushing, the entities simply get processed again, as nothing marked them as seen."""
+
+    def __init__(self, seen_cache: SeenCache):
+        self.seen_cache = seen_cache
+        self.seen_rows: list[dict] = []
+        self.corpus_rows: list[dict] = []
+
+    def add(self, entity_id: int, entity_type: EntityType, entity_url: str, texts: dict[FilterType, list[str]] | None = None):
+        self.seen_rows.append({
+            "entity_id": entity_id,
+            "entity_type": entity_type,
+            "entity_url": entity_url if Config.seen_store_urls else None,
+        })
+        # The scanned texts are stored so that filters can be backtested against them
+        if texts is None or Config.backtest_corpus_days < 1:
+            return
+        for content_type, type_texts in texts.items():
+            for text in type_texts:
+                if not text:
+                    continue
+                self.corpus_rows.append({
+                    "entity_id": entity_id,
+                    "entity_type": entity_type,
+                    "content_type": content_type,
+                    "content": text,
+                })
+
+    def flush(self):
+        if not self.seen_rows:
+            return
+        database.insert_seen_rows(self.seen_rows)
+        database.insert_corpus_rows(self.corpus_rows)
+        db.session.commit()
+        for row in self.seen_rows:
+            self.seen_cache.add(row["entity_id"], row["entity_type"])
+        self.seen_rows = []
+        self.corpus_rows = []
+
+    def __len__(self):
+        return len(self.seen_rows)
@@ -0,0 +1,64 @@
+from collections import OrderedDict
+
+from loguru import logger
+
+import threativore.database as database
+from threativore.enums import EntityType
+
+
+class SeenCache:
+    """Remembers the latest entities we've already processed, so that the dedup checks of every loop iteration
+    don't have to ask the DB about IDs we decided on seconds ago.
+    Only entities known to be seen are cached. Anything not in the cache is looked up in the seen table,
+    unless the cache holds the whole table, as we are the only ones adding to it."""
+
+    def __init__(self, max_size: int = 50000):
+        self.max_size = max_size
+        self.seen_entities: OrderedDict[tuple[EntityType, int], None] = OrderedDict()
+        # True while every row of the seen table is also in the cache
+        self.complete = False
+        self.hits = 0
+        self.misses = 0
+
+    def warm(self):
+        """Fills the cache with the latest rows of the seen table"""
+        if self.max_size <= 0:
+            return
+        latest_seen = database.get_latest_seen(self.max_size)
+        # They come newest first, so we add them in reverse to keep the newest as the most recently used
+        for entity_id, entity_type in reversed(latest_seen):
+            self.add(entity_id, entity_type)
+        self.complete = len(latest_seen) < self.max_size
+        logger.debug(f"Warmed the seen cache with {len(self.seen_entities)} entities")
+
+    def add(self, entity_id: int, entity_type: EntityType):
+        if self.max_size <= 0:
+            return
+        key = (entity_type, entity_id)
+        self.seen_entities[key] = None
+        self.seen_entities.move_to_end(key)
+        if len(self.seen_entities) > self.max_size:
+            self.seen_entities.popitem(last=False)
+            self.complete = False
+
+    def get_seen_ids(self, entity_ids: list[int], entity_type: EntityType) -> set[int]:
+        """Same as database.get_seen_ids() but only queries the DB for the IDs which are not cached"""
+        seen_ids = set()
+        uncached_ids = []
+        for entity_id in entity_ids:
+            key = (entity_type, entity_id)
+            if key in self.seen_entities:
+                self.seen_entities.move_to_end(key)
+                seen_ids.add(entity_id)
+            else:
+                uncached_ids.append(entity_id)
+        self.hits += len(seen_ids)
+        self.misses += len(uncached_ids)
+        if uncached_ids and not self.complete:
+            for entity_id in database.get_seen_ids(uncached_ids, entity_type):
+                self.add(entity_id, entity_type)
+                seen_ids.add(entity_id)
+        return seen_ids
+
+    def __len__(self):
+        return len(self.seen_entities)
@@ -17,6 +17,11 @@ class Config:
     # DB Stuff
     use_sqlite: bool = env.bool("USE_SQLITE", True) 
     sqlite_filename: str = env.str("SQLITE_FILENAME", "threativore.db")
+    sqlite_wal: bool = env.bool("SQLITE_WAL", True)
+    sqlite_cache_size_mib: int = env.int("SQLITE_CACHE_SIZE_MIB", 64)
+    sqlite_mmap_size_mib: int = env.int("SQLITE_MMAP_SIZE_MIB", 256)
+    sqlite_busy_timeout: int = env.int("SQLITE_BUSY_TIMEOUT", 5000)
+    sqlite_foreign_keys: bool = env.bool("SQLITE_FOREIGN_KEYS", False)
     postgres_user: str = env("POSTGRES_USER", "postgres")
     postgres_pass = env("POSTGRES_PASS", None)
     postgres_url = env("POSTGRES_URL", None)
@@ -47,6 +52,36 @@ class Config:
     application_deny_list: list[str] = env.list("APPLICATION_DENY_LIST", [], subcast=str)
     application_deny_reason: str = env.str("APPLICATION_DENY_REASON", None)
     application_deny_min_length: int = env.int("APPLICATION_DENY_MIN_LENGTH", None)
+    # Filters
+    filter_regex_timeout: float = env.float("FILTER_REGEX_TIMEOUT", 0.5)
+    filter_regex_check_budget: float = env.float("FILTER_REGEX_CHECK_BUDGET", 0.1)
+    filter_timeout_strikes: int = env.int("FILTER_TIMEOUT_STRIKES", 3)
+    filter_stats_flush_interval: int = env.int("FILTER_STATS_FLUSH_INTERVAL", 300)
+    filter_reorder_interval: int = env.int("FILTER_REORDER_INTERVAL", 600)
+    filter_pool_workers: int = env.int("FILTER_POOL_WORKERS", 0)
+    filter_pool_threshold: int = env.int("FILTER_POOL_THRESHOLD", 10)
+    # Storing the scanned texts for backtesting is opt-in
+    backtest_corpus_days: int = env.int("BACKTEST_CORPUS_DAYS", 0)
+    backtest_max_items: int = env.int("BACKTEST_MAX_ITEMS", 50000)
+    backtest_chunk_size: int = env.int("BACKTEST_CHUNK_SIZE", 1000)
+    backtest_time_budget: float = env.float("BACKTEST_TIME_BUDGET", 10)
+    # Also store the URL of every seen entity, for debugging
+    seen_store_urls: bool = env.bool("SEEN_STORE_URLS", False)
+    # Store the seen rows in partitions per period, which get dropped whole once they expire
+    seen_partitioning: bool = env.bool("SEEN_PARTITIONING", False)
+    seen_partition_days: int = env.int("SEEN_PARTITION_DAYS", 1)
+    # How often to delete old rows, and how many to delete at a time
+    gc_interval: int = env.int("GC_INTERVAL", 3600)
+    gc_batch_size: int = env.int("GC_BATCH_SIZE", 1000)
+    gc_batch_pause: float = env.float("GC_BATCH_PAUSE", 0.5)
+    # Stop scanning pages of comments and posts once we reach the highest ID we processed before
+    cursor_ingestion: bool = env.bool("CURSOR_INGESTION", False)
+    # How often to reload the users bypassing the filters from the DB, to catch changes made outside of threativore
+    privileged_actors_reload_interval: int = env.int("PRIVILEGED_ACTORS_RELOAD_INTERVAL", 300)
+    # How many of the latest seen comments, posts and reports to remember in memory
+    seen_cache_size: int = env.int("SEEN_CACHE_SIZE", 50000)
+    # How often to log the memory used by the process. 0 disables it.
+    memory_log_interval: int = env.int("MEMORY_LOG_INTERVAL", 3600)
     # For use with the connection to the lemmy DB directly
     lemmy_db_host: str = env.str("LEMMY_DB_HOST", None)
     lemmy_db_username: str = env.str("LEMMY_DB_USERNAME", None)
@@ -1,13 +1,21 @@
 from datetime import datetime, timedelta
-from threativore.enums import EntityType, FilterType, UserRoleTypes
-from threativore.orm.filters import Filter, FilterMatch, FilterAppeal
+from threativore.enums import EntityType, FilterType
+from threativore.orm.filters import Filter, FilterMatch, FilterAppeal, FilterStat
 from threativore.orm.seen import Seen
-from threativore.orm.user import User, UserRole, UserTag, UserAlias
+from threativore.orm.corpus import CorpusEntry
+from threativore.orm.user import User, UserRole, UserTag, UserAlias, UserFlag
 from threativore.orm.governance import GovernancePost, GovernancePostComment
-from threativore.flask import db
+from threativore.flask import db, SQLITE_MODE
+from threativore.config import Config
+from threativore.argparser import args
+from threativore import seen_partitions
+from threativore.privileged_actors import BYPASS_ROLES, privileged_actors
 from threativore.enums import GovernancePostType
-from sqlalchemy.sql import exists
-from sqlalchemy import func, or_, and_, not_
+from sqlalchemy import func, or_, and_, tuple_, null
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 
 def get_all_filters(
@@ -27,6 +35,28 @@ def get_all_filters(
     return query.all()
 
 
+def get_enabled_filters() -> list[Filter]:
+    return Filter.query.filter(
+        Filter.disabled.is_(False),
+    ).order_by(Filter.id).all()
+
+
+def get_filters_with_stats(filter_ids: list[int]) -> list[Filter]:
+    return Filter.query.options(
+        selectinload(Filter.stats),
+    ).filter(
+        Filter.id.in_(filter_ids),
+    ).all()
+
+
+def get_filter_stats(sort_by: str = "total_runtime", limit: int = 20) -> list[FilterStat]:
+    return FilterStat.query.options(
+        selectinload(FilterStat.filter),
+    ).order_by(
+        getattr(FilterStat, sort_by).desc(),
+    ).limit(limit).all()
+
+
 def does_filter_exist(filter_regex: str, filter_scope: str = 'global') -> bool:
     return Filter.query.filter_by(
         regex=filter_regex,
@@ -64,6 +94,23 @@ def get_appeal(appeal_id: int) -> FilterAppeal:
 def get_user(user_url: str) -> User | None:
     return User.query.filter_by(user_url=user_url).first()
 
+def get_user_details(user_url: str, privilege: int = 0) -> dict | None:
+    """Loads the user along with everything needed for their details, including their warning flag count, in a single query"""
+    warning_flag_count = (
+        db.session.query(func.count(UserFlag.id))
+        .filter(UserFlag.user_id == User.id, UserFlag.flag == "warning")
+        .correlate(User)
+        .scalar_subquery()
+    )
+    relationships = [joinedload(User.roles), joinedload(User.tags)]
+    if privilege > 0:
+        relationships.append(joinedload(User.aliases))
+    user_row = db.session.query(User, warning_flag_count).options(*relationships).filter(User.user_url == user_url).first()
+    if not user_row:
+        return None
+    user, warning_flags = user_row
+    return user.get_details(privilege, warning_flags=warning_flags)
+
 def get_user_from_override_email(user_email: str) -> User | None:
     return User.query.filter_by(email_override=user_email).first()
 
@@ -72,39 +119,113 @@ def get_user_from_alias(user_url: str) -> User | None:
     if alias:
         return alias.user
 
-def actor_bypasses_filter(user_url: str) -> User:
-    return db.session.query(
-        exists().where(
-            and_(
-                UserRole.user_id == User.id,
-                UserRole.user_role.in_([UserRoleTypes.ADMIN, UserRoleTypes.MODERATOR, UserRoleTypes.TRUSTED]),
-            )
-        ).where(
-            User.user_url == user_url
-        )
-    ).scalar()
+def get_users_by_urls(user_urls: list[str], resolve_aliases: bool = True) -> dict[str, User]:
+    """Returns the users matching any of the URLs, keyed by the URL they matched, with their roles and tags loaded.
+    If resolve_aliases is set, URLs which are an alias of a user are also matched in the same query.
+    A user's own URL always takes precedence over an alias."""
+    user_urls = set(user_urls)
+    if not user_urls:
+        return {}
+    query = db.session.query(User, UserAlias.user_url if resolve_aliases else null()).options(
+        selectinload(User.roles),
+        selectinload(User.tags),
+    )
+    if resolve_aliases:
+        query = query.outerjoin(
+            UserAlias,
+            and_(UserAlias.user_id == User.id, UserAlias.user_url.in_(user_urls)),
+        ).filter(or_(User.user_url.in_(user_urls), UserAlias.user_url.isnot(None)))
+    else:
+        query = query.filter(User.user_url.in_(user_urls))
+    users_by_url = {}
+    alias_matches = {}
+    for user, alias_url in query:
+        if user.user_url in user_urls:
+            users_by_url[user.user_url] = user
+        if alias_url:
+            alias_matches[alias_url] = user
+    for alias_url, user in alias_matches.items():
+        users_by_url.setdefault(alias_url, user)
+    return users_by_url
+
+def get_privileged_actor_urls() -> set[str]:
+    """Returns the URLs and aliases of all users who bypass the filters"""
+    privileged_user_ids = db.session.query(UserRole.user_id).filter(
+        UserRole.user_role.in_(BYPASS_ROLES),
+        UserRole.value == True,
+    )
+    actor_urls = {row.user_url for row in db.session.query(User.user_url).filter(User.id.in_(privileged_user_ids))}
+    actor_urls.update(
+        row.user_url for row in db.session.query(UserAlias.user_url).filter(UserAlias.user_id.in_(privileged_user_ids))
+    )
+    return actor_urls
 
+def reload_privileged_actors():
+    privileged_actors.reload(get_privileged_actor_urls())
 
-def has_been_seen(entity_id: int, entity_type: EntityType):
-    return (
-        Seen.query.filter_by(
-            entity_id=entity_id,
-            entity_type=entity_type,
-        ).count()
-        == 1
-    )
+def actor_bypasses_filter(user_url: str) -> bool:
+    if privileged_actors.is_stale(Config.privileged_actors_reload_interval):
+        reload_privileged_actors()
+    return user_url in privileged_actors
 
-def has_any_entry_been_seen(entity_ids: list[int], entity_type: EntityType) -> bool:
-    return (
-        Seen.query.filter(
+
+def get_seen_ids(entity_ids: list[int], entity_type: EntityType) -> set[int]:
+    """Returns which of the provided entity IDs have already been seen, in a single query"""
+    if not entity_ids:
+        return set()
+    if Config.seen_partitioning:
+        return seen_partitions.get_seen_ids(entity_ids, entity_type, args.gc_days)
+    return {
+        row.entity_id for row in db.session.query(Seen.entity_id).filter(
             Seen.entity_id.in_(entity_ids),
             Seen.entity_type == entity_type,
-        ).count()
-        >= 1
+        )
+    }
+
+def get_latest_seen(limit: int) -> list[tuple[int, EntityType]]:
+    if Config.seen_partitioning:
+        return seen_partitions.get_latest_seen(limit, args.gc_days)
+    return [
+        (row.entity_id, row.entity_type) for row in db.session.query(Seen.entity_id, Seen.entity_type).order_by(
+            Seen.updated.desc()
+        ).limit(limit)
+    ]
+
+def get_upsert(model):
+    """Returns an INSERT for the model which supports ON CONFLICT on the DB we're using"""
+    if SQLITE_MODE:
+        return sqlite_insert(model)
+    return postgresql_insert(model)
+
+def insert_seen_rows(rows: list[dict]):
+    """Bulk inserts seen rows, skipping the entities which are already in there. Does not commit."""
+    if not rows:
+        return
+    if Config.seen_partitioning:
+        seen_partitions.insert_seen_rows(rows)
+        return
+    db.session.execute(
+        get_upsert(Seen).on_conflict_do_nothing(index_elements=["entity_type", "entity_id"]),
+        rows,
     )
 
-def filter_match_exists(entity_id: int) -> bool:
-    return FilterMatch.query.filter_by(entity_id=entity_id).count() == 1
+def insert_corpus_rows(rows: list[dict]):
+    """Bulk inserts corpus rows. Does not commit."""
+    if not rows:
+        return
+    db.session.execute(insert(CorpusEntry), rows)
+
+def insert_filter_match(**columns) -> int:
+    """Stores the filter match unless the entity or the report already has one, and returns the ID of the match covering it.
+    Commits immediately, as the ID is sent out in the appeal instructions."""
+    # Both entity_id and report_id are unique, so this must not be limited to a single conflict target
+    db.session.execute(get_upsert(FilterMatch).values(**columns).on_conflict_do_nothing())
+    db.session.commit()
+    match_id = db.session.query(FilterMatch.id).filter_by(entity_id=columns["entity_id"]).scalar()
+    if match_id is None and columns.get("report_id") is not None:
+        # The report already has a match, stored for another entity
+        match_id = db.session.query(FilterMatch.id).filter_by(report_id=columns["report_id"]).scalar()
+    return match_id
 
 def get_filter_match_by_entity(entity_id: int) -> FilterMatch | None:
     return FilterMatch.query.filter_by(entity_id=entity_id).first()
@@ -112,10 +233,67 @@ def get_filter_match_by_entity(entity_id: int) -> FilterMatch | None:
 def get_filter_match(filter_match_id: int) -> FilterMatch | None:
     return FilterMatch.query.filter_by(id=filter_match_id).first()
 
-def delete_seen_rows(days_older_than:int=7):
+def delete_seen_rows(days_older_than:int=7, limit: int | None = None):
+    """Deletes the seen rows not updated in the provided amount of days.
+    If a limit is provided, only deletes up to that many of the oldest ones, so that we don't lock the table for long."""
+    cutoff = datetime.utcnow() - timedelta(days=days_older_than)
+    if limit is None:
+        return Seen.query.filter(Seen.updated < cutoff).delete()
+    oldest_keys = db.session.query(Seen.entity_type, Seen.entity_id).filter(Seen.updated < cutoff).order_by(Seen.updated).limit(limit)
     return Seen.query.filter(
-        Seen.updated < datetime.utcnow() - timedelta(days=days_older_than)
-    ).delete()
+        tuple_(Seen.entity_type, Seen.entity_id).in_(oldest_keys.subquery().select())
+    ).delete(synchronize_session=False)
+
+
+def prepare_seen_partitions():
+    seen_partitions.prepare_partitions()
+
+
+def drop_expired_seen_partitions(days_older_than: int = 7) -> list[str]:
+    return seen_partitions.drop_expired_partitions(days_older_than)
+
+
+def delete_corpus_rows(days_older_than: int = 7, limit: int | None = None):
+    cutoff = datetime.utcnow() - timedelta(days=days_older_than)
+    if limit is None:
+        return CorpusEntry.query.filter(CorpusEntry.created < cutoff).delete()
+    oldest_ids = db.session.query(CorpusEntry.id).filter(CorpusEntry.created < cutoff).order_by(CorpusEntry.created).limit(limit)
+    return CorpusEntry.query.filter(CorpusEntry.id.in_(oldest_ids.scalar_subquery())).delete(synchronize_session=False)
+
+
+def stream_corpus(content_types: list[FilterType], limit: int, chunk_size: int = 1000):
+    """Yields (entity_id, entity_type, content) of the latest corpus entries, fetching chunk_size of them at a time"""
+    return db.session.query(
+        CorpusEntry.entity_id,
+        CorpusEntry.entity_type,
+        CorpusEntry.content,
+    ).filter(
+        CorpusEntry.content_type.in_(content_types),
+    ).order_by(
+        CorpusEntry.id.desc(),
+    ).limit(limit).yield_per(chunk_size)
+
+
+def stream_filter_match_content(filter_types: list[FilterType], limit: int, chunk_size: int = 1000):
+    """Yields the content which triggered filters of these types, fetching chunk_size of them at a time"""
+    return db.session.query(
+        FilterMatch.content,
+    ).join(
+        Filter, FilterMatch.filter_id == Filter.id,
+    ).filter(
+        Filter.filter_type.in_(filter_types),
+    ).order_by(
+        FilterMatch.id.desc(),
+    ).limit(limit).yield_per(chunk_size)
+
+
+def get_filter_matched_entity_ids(entity_ids: list[int], entity_type: EntityType) -> set[int]:
+    return {
+        row.entity_id for row in db.session.query(FilterMatch.entity_id).filter(
+            FilterMatch.entity_id.in_(entity_ids),
+            FilterMatch.entity_type == entity_type,
+        )
+    }
 
 
 def count_user_vouches(user_url: str):
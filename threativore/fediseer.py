@@ -25,14 +25,14 @@ class ThreativoreFediseer:
             self.standard_tasks.start()
 
     def standard_tasks(self):
-        with APP.app_context():        
-            while True:
+        while True:
+            # A fresh DB session per run, so that it doesn't hold on to the objects of every previous one
+            with APP.app_context():
                 try:
                     self.refresh_blocklist()
-                    time.sleep(600)
                 except Exception as err:
                     logger.warning(f"Exception during loop: {err}. Will continue after sleep...")
-                    time.sleep(600)
+            time.sleep(600)
 
     def refresh_blocklist(self):
         if KeyStore.get_validating_blocklist():
@@ -2,6 +2,7 @@ from flask import Flask
 from flask_caching import Cache
 from flask_sqlalchemy import SQLAlchemy
 from loguru import logger
+from sqlalchemy import event
 from werkzeug.middleware.proxy_fix import ProxyFix
 from threativore.config import Config
 
@@ -25,7 +26,26 @@ else:
 APP.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 db = SQLAlchemy(APP)
 
-if not SQLITE_MODE:
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Runs on every new SQLite connection, as most of these pragmas only apply to the connection which sets them"""
+    cursor = dbapi_connection.cursor()
+    if Config.sqlite_wal:
+        # This one is stored in the DB file, but setting it again is a no-op
+        cursor.execute("PRAGMA journal_mode=WAL")
+        # Safe against corruption in WAL mode. A power loss can only lose the latest commits.
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    # Negative values are in KiB
+    cursor.execute(f"PRAGMA cache_size=-{Config.sqlite_cache_size_mib * 1024}")
+    cursor.execute(f"PRAGMA mmap_size={Config.sqlite_mmap_size_mib * 1024 * 1024}")
+    cursor.execute(f"PRAGMA busy_timeout={Config.sqlite_busy_timeout}")
+    if Config.sqlite_foreign_keys:
+        cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+if SQLITE_MODE:
+    with APP.app_context():
+        event.listen(db.engine, "connect", set_sqlite_pragmas)
+else:
     with APP.app_context():
         logger.warning(f"pool size = {db.engine.pool.size()}")
 logger.init_ok("Threativore Database", status="Started")
@@ -0,0 +1,86 @@
+import hashlib
+import unicodedata
+from collections import OrderedDict
+
+import regex as re
+
+# Characters which render as nothing, used to split up words so that filters don't see them
+ZERO_WIDTH_CHARS = [
+    "\u00ad",  # soft hyphen
+    "\u034f",  # combining grapheme joiner
+    "\u061c",  # arabic letter mark
+    "\u115f",
+    "\u1160",
+    "\u17b4",
+    "\u17b5",
+    "\u180e",  # mongolian vowel separator
+    "\u200b",  # zero width space
+    "\u200c",  # zero width non-joiner
+    "\u200d",  # zero width joiner
+    "\u200e",  # left-to-right mark
+    "\u200f",  # right-to-left mark
+    "\u202a",
+    "\u202b",
+    "\u202c",
+    "\u202d",
+    "\u202e",
+    "\u2060",  # word joiner
+    "\u2061",
+    "\u2062",
+    "\u2063",
+    "\u2064",
+    "\u3164",  # hangul filler
+    "\ufeff",  # zero width no-break space
+    "\uffa0",
+]
+
+# Lookalikes of latin letters which NFKC does not fold. Mostly cyrillic and greek.
+CONFUSABLES = {
+    "а": "a", "в": "b", "е": "e", "ё": "e", "к": "k", "м": "m", "н": "h", "о": "o", "р": "p", "с": "c",
+    "т": "t", "у": "y", "х": "x", "ѕ": "s", "і": "i", "ї": "i", "ј": "j", "ԁ": "d", "ԛ": "q", "ԝ": "w",
+    "ɑ": "a", "ɡ": "g", "ɩ": "i", "ɪ": "i", "ʏ": "y", "ᴄ": "c", "ᴏ": "o", "ᴠ": "v", "ᴡ": "w", "ᴢ": "z",
+    "А": "A", "В": "B", "Е": "E", "Ё": "E", "К": "K", "М": "M", "Н": "H", "О": "O", "Р": "P", "С": "C",
+    "Т": "T", "У": "Y", "Х": "X", "Ѕ": "S", "І": "I", "Ї": "I", "Ј": "J", "Ԁ": "D", "Ԛ": "Q", "Ԝ": "W",
+    "α": "a", "β": "b", "ε": "e", "η": "n", "ι": "i", "κ": "k", "ν": "v", "ο": "o", "ρ": "p", "τ": "t",
+    "υ": "u", "χ": "x",
+    "Α": "A", "Β": "B", "Ε": "E", "Ζ": "Z", "Η": "H", "Ι": "I", "Κ": "K", "Μ": "M", "Ν": "N", "Ο": "O",
+    "Ρ": "P", "Τ": "T", "Υ": "Y", "Χ": "X",
+}
+
+NORMALIZATION_TABLE = str.maketrans({**{c: None for c in ZERO_WIDTH_CHARS}, **CONFUSABLES})
+WHITESPACE_SEARCH = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Folds fullwidth and other compatibility characters, strips zero-width characters,
+    replaces known lookalike letters with their latin equivalent and collapses all whitespace to single spaces"""
+    text = unicodedata.normalize("NFKC", text)
+    text = text.translate(NORMALIZATION_TABLE)
+    return WHITESPACE_SEARCH.sub(" ", text).strip()
+
+
+class NormalizationCache:
+    """Remembers the normalized form of the latest texts, keyed by a hash of their content,
+    so that every filter opting into normalization doesn't pay for it again"""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self.normalized_texts: OrderedDict[bytes, str] = OrderedDict()
+
+    def normalize(self, text: str) -> str:
+        content_hash = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        if content_hash in self.normalized_texts:
+            self.normalized_texts.move_to_end(content_hash)
+            return self.normalized_texts[content_hash]
+        normalized_text = normalize_text(text)
+        self.normalized_texts[content_hash] = normalized_text
+        if len(self.normalized_texts) > self.max_size:
+            self.normalized_texts.popitem(last=False)
+        return normalized_text
+
+
+normalization_cache = NormalizationCache()
+
+
+def get_normalized_text(text: str) -> str:
+    return normalization_cache.normalize(text)
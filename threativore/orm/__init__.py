@@ -1,12 +1,21 @@
+from loguru import logger
+from sqlalchemy import inspect
+
 from threativore.flask import APP, db
+from threativore import exceptions as e
 from threativore.orm.filters import Filter
 from threativore.orm.governance import GovernancePost
 from threativore.orm.seen import Seen
 from threativore.orm.user import User
 from threativore.orm.keystore import KeyStore
+from threativore.orm.corpus import CorpusEntry
 
 with APP.app_context():
     db.create_all()
+    # create_all() leaves existing tables alone, and writing to a seen table of the old layout fails on every page
+    if "created" in {column["name"] for column in inspect(db.engine).get_columns("seen")}:
+        logger.critical("The seen table still has its layout from before 0.22.0. Convert it as described in README_upgrades.md")
+        raise e.ThreativoreException("Outdated seen table")
 
 
 __all__ = [
@@ -15,4 +24,5 @@ __all__ = [
     "Seen",
     "GovernancePost",
     "KeyStore",
+    "CorpusEntry",
 ]
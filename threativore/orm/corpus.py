@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from sqlalchemy import Enum
+
+from threativore.enums import EntityType, FilterType
+from threativore.flask import db
+
+
+class CorpusEntry(db.Model):
+    """For storing the texts of recently scanned entities, so that new filters can be backtested against them"""
+
+    __tablename__ = "corpus"
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity_id = db.Column(db.Integer, nullable=False, index=True)
+    entity_type = db.Column(Enum(EntityType), nullable=False)
+    # The kind of filter which would run against this text. Only COMMENT, USERNAME or URL.
+    content_type = db.Column(Enum(FilterType), nullable=False, index=True)
+    content = db.Column(db.Text, nullable=False)
+    created = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
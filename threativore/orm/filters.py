@@ -79,10 +79,15 @@ class Filter(db.Model):
     reason: str = db.Column(db.Text, nullable=False)
     filter_action: FilterAction = db.Column(Enum(FilterAction), nullable=False)
     filter_type: FilterType = db.Column(Enum(FilterType), nullable=False)
+    # Set when the filter keeps timing out while already being report-only
+    disabled: bool = db.Column(db.Boolean, nullable=False, default=False)
+    # Whether the filter runs against the normalized text, see threativore.normalization
+    normalized: bool = db.Column(db.Boolean, nullable=False, default=False)
     user_id: int = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"))
     user: User = db.relationship("User", back_populates="filters")
     filter_matches: list[FilterMatch] = db.relationship("FilterMatch", back_populates="filter")
     appeals: list[FilterAppeal] = db.relationship("FilterAppeal", back_populates="filter")
+    stats: "FilterStat" = db.relationship("FilterStat", back_populates="filter", uselist=False, cascade="all, delete-orphan")
     created: datetime = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated: datetime = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
@@ -99,3 +104,41 @@ class Filter(db.Model):
 @event.listens_for(Filter, "before_update")
 def before_update_filter_listener(mapper, connection, target):
     target.updated = datetime.utcnow()
+
+
+class FilterStat(db.Model):
+    """For storing how often each filter runs, matches and how long it takes"""
+
+    __tablename__ = "filter_stats"
+    __allow_unmapped__ = True
+
+    filter_id: int = db.Column(db.Integer, db.ForeignKey("filters.id", ondelete="CASCADE"), primary_key=True)
+    filter: Filter = db.relationship("Filter", back_populates="stats")
+    evaluations: int = db.Column(db.BigInteger, nullable=False, default=0)
+    matches: int = db.Column(db.BigInteger, nullable=False, default=0)
+    timeouts: int = db.Column(db.Integer, nullable=False, default=0)
+    # Seconds
+    total_runtime: float = db.Column(db.Float, nullable=False, default=0)
+    p99_runtime: float = db.Column(db.Float, nullable=False, default=0)
+    created: datetime = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated: datetime = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def get_details(self):
+        return {
+            "filter_id": self.filter_id,
+            "regex": self.filter.regex,
+            "filter_type": self.filter.filter_type.name,
+            "filter_action": self.filter.filter_action.name,
+            "evaluations": self.evaluations,
+            "matches": self.matches,
+            "timeouts": self.timeouts,
+            "total_runtime": self.total_runtime,
+            "p99_runtime": self.p99_runtime,
+            "updated": self.updated,
+        }
+
+
+# Define event listener to update 'updated' column before each update
+@event.listens_for(FilterStat, "before_update")
+def before_update_filter_stat_listener(mapper, connection, target):
+    target.updated = datetime.utcnow()
@@ -4,6 +4,7 @@ from datetime import datetime
 
 from sqlalchemy import event
 
+from threativore.enums import EntityType
 from threativore.flask import db
 from threativore.config import Config
 from sqlalchemy.dialects.postgresql import JSONB, JSON
@@ -64,6 +65,15 @@ class KeyStore(db.Model):
         else:
             return None
 
+    @classmethod
+    def get_watermark(cls, entity_type: EntityType) -> int:
+        """The highest entity ID of this type the scanner has processed"""
+        return cls.get_keyvalue(f"{entity_type.name.lower()}_watermark") or 0
+
+    @classmethod
+    def set_watermark(cls, entity_type: EntityType, entity_id: int):
+        cls.set_keyvalue(f"{entity_type.name.lower()}_watermark", entity_id)
+
 
 @event.listens_for(KeyStore, "before_update")
 def before_update_seen_listener(mapper, connection, target):
@@ -1,20 +1,22 @@
 from datetime import datetime
 
-from sqlalchemy import Enum, UniqueConstraint, event
+from sqlalchemy import Enum, event
 
 from threativore.enums import EntityType
 from threativore.flask import db
 
 
 class Seen(db.Model):
+    """Only used to avoid processing the same entity twice, so it's kept as small as possible.
+    The primary key doubles as the lookup index and the URL is only stored if SEEN_STORE_URLS is set."""
+
     __tablename__ = "seen"
-    __table_args__ = (UniqueConstraint("entity_id", "entity_type", name="entity_id_type"),)
+    # On sqlite, the rows are then stored in the primary key index itself, instead of in a separate b-tree
+    __table_args__ = {"sqlite_with_rowid": False}
 
-    id = db.Column(db.Integer, primary_key=True)
-    entity_id = db.Column(db.Integer, unique=False, nullable=False, index=True)
-    entity_type = db.Column(Enum(EntityType), nullable=False, index=True)
-    entity_url = db.Column(db.Text, nullable=False)
-    created = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    entity_type = db.Column(Enum(EntityType), primary_key=True)
+    entity_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    entity_url = db.Column(db.Text, nullable=True)
     updated = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
 
 
@@ -7,6 +7,7 @@ from threativore.enums import UserRoleTypes
 from threativore.flask import db
 from threativore.emoji import lemmy_emoji
 from threativore.config import Config
+from threativore.privileged_actors import privileged_actors
 from loguru import logger
 
 
@@ -104,7 +105,8 @@ class User(db.Model):
     created = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
-    roles = db.relationship("UserRole", back_populates="user", cascade="all, delete-orphan")
+    # Loaded along with the users, as we check them for almost every action
+    roles = db.relationship("UserRole", back_populates="user", cascade="all, delete-orphan", lazy="selectin")
     aliases = db.relationship("UserAlias", back_populates="user", cascade="all, delete-orphan")
     tags = db.relationship("UserTag", back_populates="user", cascade="all, delete-orphan")
     flags = db.relationship("UserFlag", back_populates="user", cascade="all, delete-orphan")
@@ -113,46 +115,41 @@ class User(db.Model):
     governance_posts = db.relationship("GovernancePost", back_populates="user", cascade="all, delete-orphan")
     governance_post_comments = db.relationship("GovernancePostComment", back_populates="user", cascade="all, delete-orphan")
 
+    def get_roles(self) -> frozenset[UserRoleTypes]:
+        """Returns the roles this user has. Only looked up in the DB the first time for each user instance."""
+        if getattr(self, "_role_cache", None) is None:
+            self._role_cache = frozenset(role.user_role for role in self.roles if role.value)
+        return self._role_cache
+
     def add_role(self, role: UserRoleTypes) -> None:
         if not isinstance(role, UserRoleTypes):
             raise e.DBException(f"{role} not a valid role")
-        existing_role = UserRole.query.filter_by(
-            user_id=self.id,
-            user_role=role,
-            value=True,
-        ).first()
-        if existing_role:
+        if role in self.get_roles():
             return
-        new_role = UserRole(
-            user_id=self.id,
-            user_role=role,
-            value=True,
+        self.roles.append(
+            UserRole(
+                user_role=role,
+                value=True,
+            )
         )
-        db.session.add(new_role)
         db.session.commit()
+        self._role_cache = None
+        privileged_actors.update_user(self)
 
     def remove_role(self, role: UserRoleTypes) -> None:
         if not isinstance(role, UserRoleTypes):
             raise e.DBException(f"{role} not a valid role")
-        existing_role = UserRole.query.filter_by(
-            user_id=self.id,
-            user_role=role,
-            value=True,
-        ).first()
-        if not existing_role:
+        if role not in self.get_roles():
             return
-        db.session.delete(existing_role)
+        for existing_role in list(self.roles):
+            if existing_role.user_role == role and existing_role.value:
+                self.roles.remove(existing_role)
         db.session.commit()
+        self._role_cache = None
+        privileged_actors.update_user(self)
 
     def has_role(self, role: UserRoleTypes) -> bool:
-        return (
-            UserRole.query.filter_by(
-                user_id=self.id,
-                user_role=role,
-                value=True,
-            ).count()
-            == 1
-        )
+        return role in self.get_roles()
 
     def set_tag(
             self, 
@@ -240,19 +237,21 @@ class User(db.Model):
         new_alias = UserAlias(user_id = self.id,user_url = alias_url)
         db.session.add(new_alias)
         db.session.commit()
+        privileged_actors.update_user(self)
 
     def remove_alias(self, alias_url: str) -> bool:
         """Returns True if alias was found and deleted, else returns false"""
-        for alias in aliases:
+        for alias in self.aliases:
             if alias.user_url == alias_url:
                 db.session.delete(alias)
                 db.session.commit()
+                privileged_actors.remove_urls({alias_url})
                 return True
         return False
 
 
     def is_moderator(self) -> bool:
-        return self.has_role(UserRoleTypes.ADMIN) or self.has_role(UserRoleTypes.MODERATOR)
+        return not self.get_roles().isdisjoint({UserRoleTypes.ADMIN, UserRoleTypes.MODERATOR})
 
     def is_muted(self) -> bool:
         return self.has_role(UserRoleTypes.MUTED)
@@ -267,49 +266,35 @@ class User(db.Model):
         return self.has_role(UserRoleTypes.ADMIN)
 
     def has_tag(self, tag: str) -> bool:
-        return (
-            UserTag.query.filter_by(
-                user_id=self.id,
-                tag="vouched",
-            ).count()
-            == 1
-        )
+        # Checked against the loaded tags, so that users fetched in bulk don't need a query each
+        return any(t.tag == tag for t in self.tags)
 
     def is_known(self) -> bool:
-        for role in self.roles:
-            # Doing it this way instead of using has_role to avoid 4 distinct calls to the DB
-            if role.user_role in [
-                UserRoleTypes.KNOWN, 
-                UserRoleTypes.TRUSTED, 
-                UserRoleTypes.MODERATOR, 
-                UserRoleTypes.ADMIN
-            ]:
-                return True
+        if not self.get_roles().isdisjoint({
+            UserRoleTypes.KNOWN, 
+            UserRoleTypes.TRUSTED, 
+            UserRoleTypes.MODERATOR, 
+            UserRoleTypes.ADMIN
+        }):
+            return True
         return self.has_tag("vouched")
 
     def can_vote(self) -> bool:
-        for role in self.roles:
-            # Doing it this way instead of using has_role to avoid 4 distinct calls to the DB
-            # FIXME: Can probably do it with a single db count to save pulling all the roles.
-            if role.user_role in [
-                UserRoleTypes.VOTING, 
-                UserRoleTypes.TRUSTED, 
-                UserRoleTypes.MODERATOR, 
-                UserRoleTypes.ADMIN
-            ]:
-                return True
+        if not self.get_roles().isdisjoint({
+            UserRoleTypes.VOTING, 
+            UserRoleTypes.TRUSTED, 
+            UserRoleTypes.MODERATOR, 
+            UserRoleTypes.ADMIN
+        }):
+            return True
         return self.has_tag("vouched")
 
     def is_trusted(self) -> bool:
-        for role in self.roles:
-            # Doing it this way instead of using has_role to avoid 3 distinct calls to the DB
-            if role.user_role in [
-                UserRoleTypes.TRUSTED, 
-                UserRoleTypes.MODERATOR, 
-                UserRoleTypes.ADMIN
-            ]:
-                return True
-        return False
+        return not self.get_roles().isdisjoint({
+            UserRoleTypes.TRUSTED, 
+            UserRoleTypes.MODERATOR, 
+            UserRoleTypes.ADMIN
+        })
 
     def can_create_trust(self) -> bool:
         return self.is_moderator()
@@ -318,7 +303,8 @@ class User(db.Model):
         return db.session.query(UserFlag).filter_by(user_id=self.id).filter_by(flag=flag).count()
 
 
-    def compile_tags_list(self):
+    def compile_tags_list(self, warning_flags: int | None = None):
+        """Pass warning_flags if the amount of warning flags has already been counted, to avoid another query"""
         tags = []
         for t in self.tags:
             # If the tag has a custom emoji attached, use that as the flair
@@ -326,6 +312,7 @@ class User(db.Model):
             # If the tag is a known custom emoji flair, use that as the flair
             if t.tag in Config.predefined_custom_emoji_flairs:
                 flair = lemmy_emoji.get_emoji_url(Config.predefined_custom_emoji_flairs[t.tag])
+            description = None
             if t.description:
                 description = t.description
             elif t.tag in ["ko-fi_tier", "liberapay_tier", "patreon_tier"]:
@@ -339,7 +326,7 @@ class User(db.Model):
                 "expires": t.expires,
                 "description": description,
             })
-        red_flag_count = self.count_flags("warning")
+        red_flag_count = warning_flags if warning_flags is not None else self.count_flags("warning")
         if red_flag_count > 0:
             flair = "red_flag"
             if red_flag_count > 1:
@@ -353,12 +340,12 @@ class User(db.Model):
             })
         return tags
 
-    def get_details(self, privilege=0) -> dict:
+    def get_details(self, privilege=0, warning_flags: int | None = None) -> dict:
         user_details = {
             "id": self.id,
             "user_url": self.user_url,
             "roles": [role.user_role for role in self.roles],
-            "tags": self.compile_tags_list(),
+            "tags": self.compile_tags_list(warning_flags),
             "created": self.created,
             "updated": self.updated,
         }
@@ -0,0 +1,41 @@
+import time
+
+from threativore.enums import UserRoleTypes
+
+# The roles whose holders bypass the filters
+BYPASS_ROLES = frozenset({UserRoleTypes.ADMIN, UserRoleTypes.MODERATOR, UserRoleTypes.TRUSTED})
+
+
+class PrivilegedActors:
+    """Keeps the URLs of all users bypassing the filters in memory, along with their aliases,
+    so that the scanner doesn't need a DB query for every comment and post.
+    Kept up to date by the User role and alias methods, and fully reloaded periodically to catch changes made directly in the DB."""
+
+    def __init__(self):
+        self.actor_urls: set[str] = set()
+        self.last_reload: float | None = None
+
+    def is_stale(self, reload_interval: int) -> bool:
+        return self.last_reload is None or time.time() - self.last_reload > reload_interval
+
+    def reload(self, actor_urls: set[str]):
+        # Swapped in one go, so that the other threads never see a half-filled set
+        self.actor_urls = actor_urls
+        self.last_reload = time.time()
+
+    def update_user(self, user):
+        """Adds or removes the user and their aliases, depending on whether they currently hold a bypassing role"""
+        user_urls = {user.user_url} | {alias.user_url for alias in user.aliases}
+        if user.get_roles().isdisjoint(BYPASS_ROLES):
+            self.actor_urls.difference_update(user_urls)
+        else:
+            self.actor_urls.update(user_urls)
+
+    def remove_urls(self, user_urls: set[str]):
+        self.actor_urls.difference_update(user_urls)
+
+    def __contains__(self, user_url: str) -> bool:
+        return user_url in self.actor_urls
+
+
+privileged_actors = PrivilegedActors()
@@ -0,0 +1,208 @@
+"""Optional time-partitioned storage for the seen rows.
+On Postgres the rows go into a table partitioned by range on the start of their period. On SQLite they go into one table per period.
+Either way, expiring old rows is a matter of dropping whole partitions, instead of deleting rows one by one."""
+from datetime import date, datetime, timedelta
+
+import regex as re
+from loguru import logger
+from sqlalchemy import Column, Date, DateTime, Enum, Index, Integer, MetaData, PrimaryKeyConstraint, Table, Text, inspect, select, text, union_all
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from threativore.config import Config
+from threativore.enums import EntityType
+from threativore.flask import db, SQLITE_MODE
+
+PARENT_TABLE_NAME = "seen_partitioned"
+PARTITION_NAME_MATCH = re.compile(r"seen_(\d{8})")
+# Kept apart from db.metadata, so that db.create_all() doesn't try to create them
+partition_metadata = MetaData()
+# The partitions we know exist, so that we don't ask the DB on every lookup. Filled on first use.
+known_partitions: set[date] = set()
+known_partitions_loaded = False
+
+
+def get_seen_columns():
+    """Same layout as the Seen table"""
+    return [
+        Column("entity_type", Enum(EntityType), nullable=False),
+        Column("entity_id", Integer, nullable=False, autoincrement=False),
+        Column("entity_url", Text, nullable=True),
+        Column("updated", DateTime, default=datetime.utcnow, nullable=False),
+    ]
+
+
+def get_period_start(moment: datetime) -> date:
+    """Partitions are aligned to days since the start of the calendar, so that weekly ones start on Mondays"""
+    ordinal = moment.toordinal()
+    return date.fromordinal(ordinal - (ordinal - 1) % Config.seen_partition_days)
+
+
+def get_partition_name(period_start: date) -> str:
+    return f"seen_{period_start.strftime('%Y%m%d')}"
+
+
+def get_partition_table(period_start: date) -> Table:
+    name = get_partition_name(period_start)
+    if name in partition_metadata.tables:
+        return partition_metadata.tables[name]
+    return Table(
+        name,
+        partition_metadata,
+        *get_seen_columns(),
+        PrimaryKeyConstraint("entity_type", "entity_id"),
+        Index(f"ix_{name}_updated", "updated"),
+        sqlite_with_rowid=False,
+    )
+
+
+def get_parent_table() -> Table:
+    if PARENT_TABLE_NAME in partition_metadata.tables:
+        return partition_metadata.tables[PARENT_TABLE_NAME]
+    # Postgres requires the partition key to be part of the primary key. Partitioning on the start of the period
+    # instead of the timestamp means the primary key still catches an entity inserted twice in the same period.
+    return Table(
+        PARENT_TABLE_NAME,
+        partition_metadata,
+        *get_seen_columns(),
+        Column("period", Date, nullable=False),
+        PrimaryKeyConstraint("entity_type", "entity_id", "period"),
+        postgresql_partition_by="RANGE (period)",
+    )
+
+
+def get_existing_partitions() -> list[date]:
+    """Returns the start of the period of each existing partition, newest first"""
+    global known_partitions_loaded
+    if not known_partitions_loaded:
+        for table_name in inspect(db.session.connection()).get_table_names():
+            partition_match = PARTITION_NAME_MATCH.fullmatch(table_name)
+            if partition_match:
+                known_partitions.add(datetime.strptime(partition_match.group(1), "%Y%m%d").date())
+        known_partitions_loaded = True
+    return sorted(known_partitions, reverse=True)
+
+
+def get_partitions_in_window(retention_days: int) -> list[date]:
+    """The partitions which can hold rows newer than the retention window, newest first"""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    return [
+        period_start for period_start in get_existing_partitions()
+        if period_start + timedelta(days=Config.seen_partition_days) > cutoff.date()
+    ]
+
+
+def ensure_partition(period_start: date):
+    if period_start in get_existing_partitions():
+        return
+    connection = db.session.connection()
+    if SQLITE_MODE:
+        get_partition_table(period_start).create(bind=connection, checkfirst=True)
+    else:
+        get_parent_table().create(bind=connection, checkfirst=True)
+        period_end = period_start + timedelta(days=Config.seen_partition_days)
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {get_partition_name(period_start)} PARTITION OF {PARENT_TABLE_NAME} "
+            f"FOR VALUES FROM ('{period_start.isoformat()}') TO ('{period_end.isoformat()}')"
+        ))
+    known_partitions.add(period_start)
+
+
+def prepare_partitions():
+    """Makes sure the current partition exists. The first time, it also moves the rows of the plain seen table in it,
+    so that switching to partitions doesn't make us process everything again."""
+    if get_existing_partitions():
+        ensure_partition(get_period_start(datetime.utcnow()))
+        db.session.commit()
+        return
+    now = datetime.utcnow()
+    period_start = get_period_start(now)
+    ensure_partition(period_start)
+    if SQLITE_MODE:
+        db.session.execute(text(
+            f"INSERT INTO {get_partition_name(period_start)} (entity_type, entity_id, entity_url, updated) "
+            "SELECT entity_type, entity_id, entity_url, :now FROM seen"
+        ), {"now": now})
+    else:
+        db.session.execute(text(
+            f"INSERT INTO {PARENT_TABLE_NAME} (entity_type, entity_id, entity_url, updated, period) "
+            "SELECT entity_type, entity_id, entity_url, :now, :period FROM seen"
+        ), {"now": now, "period": period_start})
+    # Nothing reads or expires the plain table while partitioning is on, so we empty it in the same transaction
+    db.session.execute(text("DELETE FROM seen"))
+    db.session.commit()
+    logger.info("Moved the existing seen rows into the first seen partition")
+
+
+def get_seen_ids(entity_ids: list[int], entity_type: EntityType, retention_days: int) -> set[int]:
+    if SQLITE_MODE:
+        # A single query over all the partitions in the window, so a lookup stays one query however long the retention is
+        partition_queries = []
+        for period_start in get_partitions_in_window(retention_days):
+            table = get_partition_table(period_start)
+            partition_queries.append(
+                select(table.c.entity_id).where(table.c.entity_id.in_(entity_ids), table.c.entity_type == entity_type)
+            )
+        if not partition_queries:
+            return set()
+        return set(db.session.scalars(union_all(*partition_queries)))
+    table = get_parent_table()
+    # Filtering on the partition key lets Postgres skip the partitions outside the window
+    return set(db.session.scalars(
+        select(table.c.entity_id).where(
+            table.c.entity_id.in_(entity_ids),
+            table.c.entity_type == entity_type,
+            table.c.period >= get_period_start(datetime.utcnow() - timedelta(days=retention_days)),
+        )
+    ))
+
+
+def get_latest_seen(limit: int, retention_days: int) -> list[tuple[int, EntityType]]:
+    latest_seen = []
+    for period_start in get_partitions_in_window(retention_days):
+        table = get_partition_table(period_start) if SQLITE_MODE else get_parent_table()
+        query = select(table.c.entity_id, table.c.entity_type)
+        if not SQLITE_MODE:
+            query = query.where(table.c.period == period_start)
+        query = query.order_by(table.c.updated.desc()).limit(limit - len(latest_seen))
+        latest_seen += [(row.entity_id, row.entity_type) for row in db.session.execute(query)]
+        if len(latest_seen) >= limit:
+            break
+    return latest_seen
+
+
+def insert_seen_rows(rows: list[dict]):
+    """Inserts the rows in the partition of the current period. Does not commit."""
+    now = datetime.utcnow()
+    period_start = get_period_start(now)
+    ensure_partition(period_start)
+    # Set explicitly, so that a period can't roll over between picking the partition and inserting
+    rows = [{**row, "updated": now} for row in rows]
+    if SQLITE_MODE:
+        db.session.execute(sqlite_insert(get_partition_table(period_start)).on_conflict_do_nothing(), rows)
+        return
+    # The uniqueness of entities can only be enforced within a period, but the rows we get are the unseen ones anyway.
+    # This only catches the same page being stored twice, like when it's scanned again after a crash.
+    rows = [{**row, "period": period_start} for row in rows]
+    db.session.execute(
+        postgresql_insert(get_parent_table()).on_conflict_do_nothing(index_elements=["entity_type", "entity_id", "period"]),
+        rows,
+    )
+
+
+def drop_expired_partitions(retention_days: int) -> list[str]:
+    """Drops the partitions whose whole period is older than the retention window, and returns their names"""
+    partitions_in_window = set(get_partitions_in_window(retention_days))
+    # We never drop the current one, in case the retention is shorter than a period
+    partitions_in_window.add(get_period_start(datetime.utcnow()))
+    dropped = []
+    for period_start in get_existing_partitions():
+        if period_start in partitions_in_window:
+            continue
+        partition_name = get_partition_name(period_start)
+        db.session.execute(text(f"DROP TABLE IF EXISTS {partition_name}"))
+        partition_metadata.remove(get_partition_table(period_start))
+        known_partitions.discard(period_start)
+        dropped.append(partition_name)
+    db.session.commit()
+    return dropped
@@ -9,14 +9,16 @@ from loguru import logger
 import threativore.database as database
 import threativore.exceptions as e
 from threativore.classes.filters import ThreativoreFilters
+from threativore.classes.filterset import COMMUNITY_SCOPE_SEARCH, get_match_text
 from threativore.classes.appeals import ThreativoreAppeals
 from threativore.classes.fediseer_actions import ThreativoreFediseerActions
 from threativore.classes.users import ThreativoreUsers
 from threativore.classes.governance import Governance
+from threativore.classes.seen_cache import SeenCache
+from threativore.classes.seen_batch import SeenBatch
 from threativore.enums import EntityType, FilterAction, FilterType, UserRoleTypes
 from threativore.flask import APP, db
-from threativore.orm.filters import FilterMatch, FilterAppeal
-from threativore.orm.seen import Seen
+from threativore.orm.keystore import KeyStore
 from threativore.orm.user import User
 from pythorhead.types.sort import CommentSortType, SortType
 from threativore.argparser import args
@@ -30,7 +32,10 @@ from threativore.webhooks import webhook_parser
 class Threativore:
 
     appeal_admins: list = []    
-    community_scope_search = re.compile(r"community::(\w+)", re.IGNORECASE)
+    community_scope_search = COMMUNITY_SCOPE_SEARCH
+    comments_page_size: int = 50
+    posts_page_size: int = 10
+    last_memory_log: float = 0
 
     def __init__(self, _base_lemmy):
         self.threativore_user_url = utils.username_to_url(f"{Config.lemmy_username}@{Config.lemmy_domain}")
@@ -40,13 +45,22 @@ class Threativore:
         self.appeals = ThreativoreAppeals(self)
         self.governance = Governance(self)
         self.fediseer_actions = ThreativoreFediseerActions(self)
+        self.seen_cache = SeenCache(Config.seen_cache_size)
         self.ensure_admin_exists()
         self.ensure_bot_exists()
         self.prepare_appeal_objects()
+        if not args.api_only:
+            with APP.app_context():
+                if Config.seen_partitioning:
+                    database.prepare_seen_partitions()
+                self.seen_cache.warm()
+                database.reload_privileged_actors()
         # In order to be able to match the bot account in the DB
         if not args.api_only and not args.test:
             self.standard_tasks = threading.Thread(target=self.standard_tasks, args=(), daemon=True)
             self.standard_tasks.start()
+            self.gc_tasks = threading.Thread(target=self.gc_tasks, args=(), daemon=True)
+            self.gc_tasks.start()
         if Config.enable_fediseer_blocklist_refresh:
             self.fediseer = ThreativoreFediseer(_base_lemmy, self)
             logger.init_ok(f"Fediseer Blocklist Synchronization", status="Started")
@@ -96,29 +110,17 @@ class Threativore:
         logger.debug("Checking Reports...")
         self.resolve_reports()
 
-    def is_scope_matching(self, scope, community):
-        if scope == 'instance' and community["local"] is False:
-            return False
-        if scope not in {'instance', 'global'}:
-            community_scope_search = self.community_scope_search.search(scope)
-            # Category scopes are always for local comms
-            if (
-                community_scope_search 
-                and community["local"] is True 
-                and community["name"] != community_scope_search.group(1)
-            ):
-                return False
-        return True
-
     def resolve_reports(self):
         rl = self.lemmy.comment.report_list(unresolved_only=False, limit=5)
         for report in self.lemmy.post.report_list():
             rl.append(report)
         # logger.info(json.dumps(rl, indent=4))
-        comment_filters = database.get_all_filters(FilterType.COMMENT)
-        report_filters = database.get_all_filters(FilterType.REPORT)
-        username_filters = database.get_all_filters(FilterType.USERNAME)
-        sorted_filters = sorted(report_filters + comment_filters + username_filters, key=lambda x: x.filter_action.value)        
+        filter_set = self.filters.get_filter_set()
+        seen_report_ids = self.seen_cache.get_seen_ids(
+            [report["comment_report" if "comment_report" in report else "post_report"]["id"] for report in rl],
+            EntityType.REPORT,
+        )
+        seen_batch = SeenBatch(self.seen_cache)
         for report in rl:            
             if "comment_report" in report.keys():
                 item_type = "comment"
@@ -129,49 +131,52 @@ class Threativore:
             entity_removed = False
             entity_banned = False
             report_id: int = report[f"{item_type}_report"]["id"]
-            if database.has_been_seen(report_id, EntityType.REPORT):
+            if report_id in seen_report_ids:
                 continue
-            for tfilter in sorted_filters:
+            reported_text = report["comment"]["content"] if item_type == "comment" else report["post"]["name"]
+            candidate_ids = filter_set.get_candidate_ids({
+                FilterType.REPORT: [reported_text],
+                FilterType.COMMENT: [reported_text],
+                FilterType.USERNAME: [report["creator"]["name"]],
+            })
+            for tfilter in filter_set.get_filters(FilterType.REPORT, FilterType.COMMENT, FilterType.USERNAME, community=report["community"]):
                 if entity_removed:
                     break
+                if tfilter.id not in candidate_ids:
+                    continue
                 matching_string = ""
                 matching_content = ""
-                if not self.is_scope_matching(tfilter.scope, report["community"]):
-                    continue
                 if tfilter.filter_type in [FilterType.REPORT,FilterType.COMMENT]:
                     actor_id = report[f'{item_type}_creator']['actor_id']
                     if item_type == "comment":
-                        filter_match = re.search(tfilter.regex, report[f"{item_type}"]["content"], re.IGNORECASE)
+                        filter_match = tfilter.search(report[f"{item_type}"]["content"])
                         matching_string = f'{item_type} content: {report[f"{item_type}"]["content"]}'
                         matching_content = report[f"{item_type}"]["content"]
                     elif item_type == "post":
-                        filter_match = re.search(tfilter.regex, report[f"{item_type}"]["name"], re.IGNORECASE)
+                        filter_match = tfilter.search(report[f"{item_type}"]["name"])
                         matching_string = f'{item_type} name: {report[f"{item_type}"]["name"]}'
                         matching_content = report[f"{item_type}"]["name"]
                     elif "body" in report[f"{item_type}"]:
-                        filter_match = re.search(tfilter.regex, report[f"{item_type}"]["body"], re.IGNORECASE)
+                        filter_match = tfilter.search(report[f"{item_type}"]["body"])
                         matching_string = f'{item_type} body: {report[f"{item_type}"]["body"]}'
                         matching_content = report[f"{item_type}"]["body"]
                 if tfilter.filter_type == FilterType.USERNAME:
-                    filter_match = re.search(tfilter.regex, report["creator"]["name"], re.IGNORECASE)
+                    filter_match = tfilter.search(report["creator"]["name"])
                     matching_string = f'{item_type} username: {report["creator"]["name"]}'
                     matching_content = report["creator"]["name"]
                 if filter_match:
                     logger.info(f"Matched anti-spam filter from {actor_id} for reported {matching_string[0:50]}... " f"regex: {filter_match}")
                     webhook_parser(f"Matched anti-spam filter from {actor_id} for reported {matching_string[0:50]}... " f"regex: {filter_match}")
                     if tfilter.filter_action != FilterAction.REPORT:
-                        if not database.filter_match_exists(report[f"{item_type}"]["id"]):
-                            new_match = FilterMatch(
-                                actor_id=report[f"{item_type}_creator"]["actor_id"],
-                                entity_id=report[f"{item_type}"]["id"],
-                                entity_type=target_type_enum,
-                                report_id=report_id,
-                                url=report[f"{item_type}"]["ap_id"],
-                                content=matching_content,
-                                filter_id=tfilter.id,
-                            )
-                            db.session.add(new_match)
-                            db.session.commit()
+                        new_match_id = database.insert_filter_match(
+                            actor_id=report[f"{item_type}_creator"]["actor_id"],
+                            entity_id=report[f"{item_type}"]["id"],
+                            entity_type=target_type_enum,
+                            report_id=report_id,
+                            url=report[f"{item_type}"]["ap_id"],
+                            content=matching_content,
+                            filter_id=tfilter.id,
+                        )
                         # logger.warning("Would remove comment from report")
                         if not Config.dry_run:
                             if item_type == "comment":
@@ -181,7 +186,7 @@ class Threativore:
                                     reason=(
                                         f"Threativore automatic comment removal from report: {tfilter.reason}\n\n"
                                         f"Appeal by sending PM with your reasoning to @{Config.lemmy_username}@{Config.lemmy_domain}, "
-                                        f"and including the text: `threativore request appeal {new_match.id}`"
+                                        f"and including the text: `threativore request appeal {new_match_id}`"
                                     ),
                                 )
                             else:
@@ -191,7 +196,7 @@ class Threativore:
                                     reason=(
                                         f"Threativore automatic post removal from report: {tfilter.reason}\n\n"
                                         f"Appeal by sending PM with your reasoning to @{Config.lemmy_username}@{Config.lemmy_domain}, "
-                                        f"and including the text: `threativore request appeal {new_match.id}`"
+                                        f"and including the text: `threativore request appeal {new_match_id}`"
                                     ),
                                 )
                         entity_removed = True
@@ -214,39 +219,61 @@ class Threativore:
                                     reason=(
                                         f"Threativore automatic ban from {item_type} report: {tfilter.reason}.\n\n"
                                         f"Appeal by sending PM with your reasoning to @{Config.lemmy_username}@{Config.lemmy_domain}, "
-                                        f"and including the text: `threativore request appeal {new_match.id}`"
+                                        f"and including the text: `threativore request appeal {new_match_id}`"
                                     ),
                                     remove_data=remove_all,
                                 )
                             entity_banned = True
-            seen_report = Seen(
-                entity_id=report_id,
-                entity_type=EntityType.REPORT,
-                entity_url=report[item_type]["ap_id"],
-            )
-            db.session.add(seen_report)
-            db.session.commit()
+            seen_batch.add(report_id, EntityType.REPORT, report[item_type]["ap_id"])
+            # We don't want to repeat any actions if we crash before the end of the batch
+            if entity_removed or entity_banned:
+                seen_batch.flush()
+        seen_batch.flush()
 
     def check_comments(self):
         seen_page_previously = False
         page = 1
         all_ids_checked_this_run = []
+        watermark = None
+        if Config.cursor_ingestion:
+            watermark = KeyStore.get_watermark(EntityType.COMMENT)
         while not seen_page_previously and page <= 10:
-            seen_page_previously, ids_checked = self.check_comments_page(page, all_ids_checked_this_run)
+            seen_page_previously, ids_checked = self.check_comments_page(page, all_ids_checked_this_run, watermark)
             page += 1
             all_ids_checked_this_run += ids_checked
+        if watermark is not None and all_ids_checked_this_run and max(all_ids_checked_this_run) > watermark:
+            KeyStore.set_watermark(EntityType.COMMENT, max(all_ids_checked_this_run))
         
 
-    def check_comments_page(self, page:int=1, ids_checked_already: list[int] = []):
+    def get_comment_texts(self, comment) -> dict[FilterType, list[str]]:
+        return {
+            FilterType.COMMENT: [comment["comment"]["content"]],
+            FilterType.USERNAME: [comment["creator"]["name"]],
+        }
+
+    def check_comments_page(self, page:int=1, ids_checked_already: list[int] = [], watermark: int | None = None):
         # logger.debug(f"Checking Comments page {page}...")
-        cm = self.lemmy.comment.list(limit=50,sort=CommentSortType.New, page=page)
+        cm = self.lemmy.comment.list(limit=self.comments_page_size,sort=CommentSortType.New, page=page)
         all_ids = [comment["comment"]["id"] for comment in cm if comment["comment"]["id"] not in ids_checked_already]
-        seen_any_previously = database.has_any_entry_been_seen(all_ids, EntityType.COMMENT)
+        seen_ids = self.seen_cache.get_seen_ids([comment["comment"]["id"] for comment in cm], EntityType.COMMENT)
+        seen_any_previously = any(comment_id in seen_ids for comment_id in all_ids)
+        # Once we reach comments older than the highest one we processed before, there's no need to fetch further pages.
+        # Lemmy doesn't strictly order them by ID, so this page is still processed in full and the seen check skips the old ones.
+        if watermark is not None and any(comment_id <= watermark for comment_id in all_ids):
+            seen_any_previously = True
         # logger.debug([seen_any_previously, len(all_ids)])
         # logger.info(json.dumps(cm, indent=4))
-        comment_filters = database.get_all_filters(FilterType.COMMENT)
-        username_filters = database.get_all_filters(FilterType.USERNAME)
-        sorted_filters = sorted(comment_filters + username_filters, key=lambda x: x.filter_action.value)
+        filter_set = self.filters.get_filter_set()
+        pooled_matches = {}
+        if Config.filter_pool_workers > 0:
+            pooled_matches = self.filters.match_in_pool(filter_set, [
+                (comment["comment"]["id"], self.get_comment_texts(comment))
+                for comment in cm
+                if not comment["comment"]["removed"]
+                and not comment["comment"]["deleted"]
+                and comment["comment"]["id"] not in seen_ids
+            ])
+        seen_batch = SeenBatch(self.seen_cache)
         for comment in cm:
             entity_removed = False
             entity_reported = False
@@ -254,7 +281,7 @@ class Threativore:
             comment_id: int = comment["comment"]["id"]
             # if comment['creator']['actor_id'] == "https://lemmy.dbzer0.com/u/div0":
             #     logger.debug(f'Found comment from bot: {comment["comment"]["content"]}')
-            if database.has_been_seen(comment_id, EntityType.COMMENT):
+            if comment_id in seen_ids:
                 continue
             user_url = comment["creator"]["actor_id"]
             if database.actor_bypasses_filter(user_url):
@@ -262,39 +289,38 @@ class Threativore:
                 continue
             if comment["comment"]["removed"] or comment["comment"]["deleted"]:
                 continue
-            for tfilter in sorted_filters:
+            entity_matches = pooled_matches.get(comment_id)
+            candidate_ids = filter_set.get_candidate_ids(self.get_comment_texts(comment))
+            for tfilter in filter_set.get_filters(FilterType.COMMENT, FilterType.USERNAME, community=comment["community"]):
                 matching_string = ""
                 matching_content = ""
                 if entity_removed:
                     break
-                if entity_reported and tfilter.filter_action == FilterAction.REPORT:
+                if tfilter.id not in candidate_ids:
                     continue
-                if not self.is_scope_matching(tfilter.scope, comment["community"]):
+                if entity_reported and tfilter.filter_action == FilterAction.REPORT:
                     continue
                 if tfilter.filter_type == FilterType.COMMENT:
-                    filter_match = re.search(tfilter.regex, comment["comment"]["content"], re.IGNORECASE)
+                    filter_match = filter_set.search(tfilter, comment["comment"]["content"], entity_matches)
                     matching_string = f'comment body: {comment["comment"]["content"]}'
                     matching_content = comment["comment"]["content"]
                 if tfilter.filter_type == FilterType.USERNAME:
-                    filter_match = re.search(tfilter.regex, comment["creator"]["name"], re.IGNORECASE)
+                    filter_match = filter_set.search(tfilter, comment["creator"]["name"], entity_matches)
                     matching_string = f'commenter username: {comment["creator"]["name"]}'
                     matching_content = comment["creator"]["name"]
                 # logger.info([comment["comment"]["content"], f.regex])
                 if filter_match:
-                    logger.info(f"Matched anti-spam filter from {user_url} for {matching_string[0:50]}... " f"regex: {filter_match}")
-                    webhook_parser(f"Matched anti-spam filter from {user_url} for {matching_string[0:50]}... " f"regex: {filter_match}")
+                    logger.info(f"Matched anti-spam filter from {user_url} for {matching_string[0:50]}... " f"regex: {get_match_text(filter_match)}")
+                    webhook_parser(f"Matched anti-spam filter from {user_url} for {matching_string[0:50]}... " f"regex: {get_match_text(filter_match)}")
                     # Comments
-                    if not database.filter_match_exists(comment_id):
-                        new_match = FilterMatch(
-                            actor_id=user_url,
-                            entity_id=comment_id,
-                            entity_type=EntityType.COMMENT,
-                            url=comment["comment"]["ap_id"],
-                            content=matching_content,
-                            filter_id=tfilter.id,
-                        )
-                        db.session.add(new_match)
-                        db.session.commit()
+                    new_match_id = database.insert_filter_match(
+                        actor_id=user_url,
+                        entity_id=comment_id,
+                        entity_type=EntityType.COMMENT,
+                        url=comment["comment"]["ap_id"],
+                        content=matching_content,
+                        filter_id=tfilter.id,
+                    )
                     if tfilter.filter_action == FilterAction.REPORT:
                         self.lemmy.comment.report(
                             comment_id=comment_id,
@@ -317,7 +343,7 @@ class Threativore:
                                 reason=(
                                     f"Threativore automatic comment removal: {tfilter.reason}\n\n"
                                     f"Appeal by sending PM with your reasoning to @{Config.lemmy_username}@{Config.lemmy_domain}, "
-                                    f"and including the text: `threativore request appeal {new_match.id}`"
+                                    f"and including the text: `threativore request appeal {new_match_id}`"
                                 ),
                             )
                         entity_removed = True
@@ -340,20 +366,18 @@ class Threativore:
                                     reason=(
                                         f"Threativore automatic ban from comment: {tfilter.reason}\n\n"
                                         f"Appeal by sending PM with your reasoning to @{Config.lemmy_username}@{Config.lemmy_domain}, "
-                                        f"and including the text: `threativore request appeal {new_match.id}`"
+                                        f"and including the text: `threativore request appeal {new_match_id}`"
                                     ),
                                     remove_data=remove_all,
                                 )
                             entity_banned = True
             # if comment['creator']['actor_id'] == "https://lemmy.dbzer0.com/u/div0": #DEBUG
             #     return (seen_any_previously,all_ids)
-            seen_comment = Seen(
-                entity_id=comment_id,
-                entity_type=EntityType.COMMENT,
-                entity_url=comment["comment"]["ap_id"],
-            )
-            db.session.add(seen_comment)
-            db.session.commit()
+            seen_batch.add(comment_id, EntityType.COMMENT, comment["comment"]["ap_id"], self.get_comment_texts(comment))
+            # We don't want to repeat any actions if we crash before the end of the batch
+            if entity_removed or entity_reported or entity_banned:
+                seen_batch.flush()
+        seen_batch.flush()
         return (seen_any_previously,all_ids)
 
 
@@ -361,29 +385,54 @@ class Threativore:
         seen_page_previously = False
         page = 1
         all_ids_checked_this_run = []
+        watermark = None
+        if Config.cursor_ingestion:
+            watermark = KeyStore.get_watermark(EntityType.POST)
         while not seen_page_previously and page <= 10:
-            seen_page_previously, ids_checked = self.check_posts_page(page, all_ids_checked_this_run)
+            seen_page_previously, ids_checked = self.check_posts_page(page, all_ids_checked_this_run, watermark)
             page += 1
             all_ids_checked_this_run += ids_checked
+        if watermark is not None and all_ids_checked_this_run and max(all_ids_checked_this_run) > watermark:
+            KeyStore.set_watermark(EntityType.POST, max(all_ids_checked_this_run))
+
+    def get_post_texts(self, post) -> dict[FilterType, list[str]]:
+        post_texts = [post["post"]["name"]]
+        if "body" in post["post"]:
+            post_texts.append(post["post"]["body"])
+        return {
+            FilterType.COMMENT: post_texts,
+            FilterType.USERNAME: [post["creator"]["name"]],
+            FilterType.URL: [post["post"]["url"]] if "url" in post["post"] else [],
+        }
 
-    def check_posts_page(self, page:int=1, ids_checked_already: list[int] = []):
+    def check_posts_page(self, page:int=1, ids_checked_already: list[int] = [], watermark: int | None = None):
         # logger.debug(f"Checking Posts page {page}...")
-        cm = self.lemmy.post.list(limit=10,sort=SortType.New, page=page)
+        cm = self.lemmy.post.list(limit=self.posts_page_size,sort=SortType.New, page=page)
         all_ids = [post["post"]["id"] for post in cm if post["post"]["id"] not in ids_checked_already]
-        seen_any_previously = database.has_any_entry_been_seen(all_ids, EntityType.POST)
+        seen_ids = self.seen_cache.get_seen_ids([post["post"]["id"] for post in cm], EntityType.POST)
+        seen_any_previously = any(post_id in seen_ids for post_id in all_ids)
+        # Once we reach posts older than the highest one we processed before, there's no need to fetch further pages.
+        # Lemmy doesn't strictly order them by ID, so this page is still processed in full and the seen check skips the old ones.
+        if watermark is not None and any(post_id <= watermark for post_id in all_ids):
+            seen_any_previously = True
         # logger.debug([seen_any_previously, len(all_ids)])
         # logger.info(json.dumps(cm, indent=4))
-        comment_filters = database.get_all_filters(FilterType.COMMENT)
-        url_filters = database.get_all_filters(FilterType.URL)
-        username_filters = database.get_all_filters(FilterType.USERNAME)
-        sorted_filters = sorted(comment_filters + username_filters + url_filters, key=lambda x: x.filter_action.value)
+        filter_set = self.filters.get_filter_set()
+        pooled_matches = {}
+        if Config.filter_pool_workers > 0:
+            pooled_matches = self.filters.match_in_pool(filter_set, [
+                (post["post"]["id"], self.get_post_texts(post))
+                for post in cm
+                if post["post"]["id"] not in seen_ids
+            ])
+        seen_batch = SeenBatch(self.seen_cache)
         for post in cm:
             post_id: int = post["post"]["id"]
             # if 'asdasdasdasdasd' in post['post'].get('url',''):
             #     logger.debug(f'Found test post url: {post["post"]["id"]} from {post["creator"]["name"]} in community {post["community"]["name"]}')
             # if 'asdasdasdasdasd' in post['post'].get('body',''):
             #     logger.debug(f'Found test post body: {post["post"]["id"]} from {post["creator"]["name"]} in community {post["community"]["name"]}')
-            if database.has_been_seen(post_id, EntityType.POST):
+            if post_id in seen_ids:
                 continue
             user_url = post["creator"]["actor_id"]
             if database.actor_bypasses_filter(user_url):
@@ -392,55 +441,56 @@ class Threativore:
             entity_removed = False
             entity_reported = False
             entity_banned = False
-            for tfilter in sorted_filters:
+            entity_matches = pooled_matches.get(post_id, {})
+            if "url" in post["post"]:
+                entity_matches = filter_set.get_domain_matches(post["post"]["url"]) | entity_matches
+            candidate_ids = filter_set.get_candidate_ids(self.get_post_texts(post))
+            for tfilter in filter_set.get_filters(FilterType.COMMENT, FilterType.USERNAME, FilterType.URL, community=post["community"]):
                 matching_string = ""
                 matching_content = ""
                 if entity_removed:
                     break
-                if entity_reported and tfilter.filter_action == FilterAction.REPORT:
+                if tfilter.id not in candidate_ids:
                     continue
-                if not self.is_scope_matching(tfilter.scope, post["community"]):
+                if entity_reported and tfilter.filter_action == FilterAction.REPORT:
                     continue
                 matched_filter = False
                 if tfilter.filter_type == FilterType.COMMENT:
-                    filter_match = re.search(tfilter.regex, post["post"]["name"], re.IGNORECASE)
+                    filter_match = filter_set.search(tfilter, post["post"]["name"], entity_matches)
                     if filter_match:
                         matched_filter = True
                         matching_string = f'post title: {post["post"]["name"]}'
                         matching_content = post["post"]["name"]
                     elif "body" in post["post"]:
-                        filter_match = re.search(tfilter.regex, post["post"]["body"], re.IGNORECASE)
+                        filter_match = filter_set.search(tfilter, post["post"]["body"], entity_matches)
                         if filter_match:
                             matched_filter = True
                             matching_string = f'post body: {post["post"]["body"]}'
                             matching_content = post["post"]["body"]
                 if "url" in post["post"] and tfilter.filter_type == FilterType.URL:
-                    filter_match = re.search(tfilter.regex, post["post"]["url"], re.IGNORECASE)
+                    filter_match = filter_set.search(tfilter, post["post"]["url"], entity_matches)
                     if filter_match:
                         matched_filter = True
                         matching_string = f'post url: {post["post"]["url"]}'
                         matching_content = post["post"]["url"]
                 if tfilter.filter_type == FilterType.USERNAME:
-                    filter_match = re.search(tfilter.regex, post["creator"]["name"], re.IGNORECASE)
+                    filter_match = filter_set.search(tfilter, post["creator"]["name"], entity_matches)
                     if filter_match:
                         matched_filter = True
                         matching_string = f'poster username: {post["creator"]["name"]}'
                         matching_content = post["creator"]["name"]
                 # logger.info([comment["comment"]["content"], f.regex])
                 if matched_filter:
-                    logger.info(f"Matched anti-spam filter from {user_url} for {matching_string[0:50]}... " f"regex: {filter_match}")
-                    webhook_parser(f"Matched anti-spam filter from {user_url} for {matching_string[0:50]}... " f"regex: {filter_match}")
-                    if not database.filter_match_exists(post_id):
-                        new_match = FilterMatch(
-                            actor_id=user_url,
-                            entity_id=post_id,
-                            entity_type=EntityType.POST,
-                            url=post["post"]["ap_id"],
-                            content=matching_content,
-                            filter_id=tfilter.id,
-                        )
-                        db.session.add(new_match)
-                        db.session.commit()
+                    logger.info(f"Matched anti-spam filter from {user_url} for {matching_string[0:50]}... " f"regex: {get_match_text(filter_match)}")
+                    webhook_parser(f"Matched anti-spam filter from {user_url} for {matching_string[0:50]}... " f"regex: {get_match_text(filter_match)}")
+                    new_match_id = database.insert_filter_match(
+                        actor_id=user_url,
+                        entity_id=post_id,
+                        entity_type=EntityType.POST,
+                        url=post["post"]["ap_id"],
+                        content=matching_content,
+                        filter_id=tfilter.id,
+                    )
                     if tfilter.filter_action == FilterAction.REPORT:
                         self.lemmy.post.report(
                             post_id=post_id,
@@ -462,7 +512,7 @@ class Threativore:
                                 reason=(
                                     f"Threativore automatic post removal: {tfilter.reason}\n\n"
                                     f"Appeal by sending PM with your reasoning to @{Config.lemmy_username}@{Config.lemmy_domain}, "
-                                    f"and including the text: `threativore request appeal {new_match.id}`"
+                                    f"and including the text: `threativore request appeal {new_match_id}`"
                                 ),
                             )
                         entity_removed = True
@@ -485,19 +535,17 @@ class Threativore:
                                     reason=(
                                         f"Threativore automatic ban from report: {tfilter.reason}\n\n"
                                         f"Appeal by sending PM with your reasoning to @{Config.lemmy_username}@{Config.lemmy_domain}, "
-                                        f"and including the text: `threativore request appeal {new_match.id}`"
+                                        f"and including the text: `threativore request appeal {new_match_id}`"
                                     ),
                                     remove_data=remove_all,
                                 )
                             entity_banned = True
 
-            seen_post = Seen(
-                entity_id=post_id,
-                entity_type=EntityType.POST,
-                entity_url=post["post"]["ap_id"],
-            )
-            db.session.add(seen_post)
-            db.session.commit()
+            seen_batch.add(post_id, EntityType.POST, post["post"]["ap_id"], self.get_post_texts(post))
+            # We don't want to repeat any actions if we crash before the end of the batch
+            if entity_removed or entity_reported or entity_banned:
+                seen_batch.flush()
+        seen_batch.flush()
         return (seen_any_previously,all_ids)
 
     def check_pms(self):
@@ -525,6 +573,20 @@ class Threativore:
                 filter_list = re.search(r"list (report|comment) filters", pm["private_message"]["content"], re.IGNORECASE)
                 if filter_list:
                     self.filters.parse_filter_list_pm(filter_list, pm)
+                filter_stats_search = re.search(
+                    r"show filter stats(?: by (runtime|p99|evaluations|matches|timeouts))?",
+                    pm["private_message"]["content"],
+                    re.IGNORECASE,
+                )
+                if filter_stats_search:
+                    self.filters.parse_filter_stats_pm(filter_stats_search, pm)
+                backtest_search = re.search(
+                    r"backtest (report|comment|url|username) filter: ?`(.+?)`[ \n]*?",
+                    pm["private_message"]["content"],
+                    re.IGNORECASE,
+                )
+                if backtest_search:
+                    self.filters.parse_backtest_pm(backtest_search, pm)
                 user_search = re.search(r"(add|remove) user: ?(.+)[ \n]*?", pm["private_message"]["content"], re.IGNORECASE)
                 if user_search:
                     self.users.parse_user_pm(user_search, pm)
@@ -633,10 +695,41 @@ class Threativore:
         )
 
     def gc(self):
-        rows_deleted = database.delete_seen_rows(args.gc_days)
-        if rows_deleted > 0:
-            logger.debug(f"Deleting {rows_deleted} Seen rows")
-        db.session.commit()
+        start = time.time()
+        if Config.seen_partitioning:
+            dropped_partitions = database.drop_expired_seen_partitions(args.gc_days)
+            if dropped_partitions:
+                logger.info(f"GC dropped the Seen partitions {', '.join(dropped_partitions)}")
+            rows_deleted = 0
+        else:
+            rows_deleted = self.delete_in_batches(database.delete_seen_rows, args.gc_days)
+        corpus_rows_deleted = self.delete_in_batches(database.delete_corpus_rows, Config.backtest_corpus_days)
+        logger.info(
+            f"GC deleted {rows_deleted} Seen rows and {corpus_rows_deleted} corpus rows "
+            f"in {round(time.time() - start, 2)} seconds"
+        )
+
+    def delete_in_batches(self, delete_function, days_older_than: int) -> int:
+        """Keeps deleting up to GC_BATCH_SIZE rows at a time, committing after each batch
+        and pausing in-between, so that the other threads get a chance to write"""
+        total_deleted = 0
+        while True:
+            rows_deleted = delete_function(days_older_than, Config.gc_batch_size)
+            db.session.commit()
+            total_deleted += rows_deleted
+            if rows_deleted < Config.gc_batch_size:
+                return total_deleted
+            time.sleep(Config.gc_batch_pause)
+
+    def gc_tasks(self):
+        while True:
+            with APP.app_context():
+                try:
+                    self.gc()
+                except Exception as err:
+                    logger.warning(f"Exception during GC: {err}. Will retry on the next run...")
+                    db.session.rollback()
+            time.sleep(Config.gc_interval)
 
     def check_applications(self):
         new_applications = self.lemmy.get_registration_applications(limit=50)
@@ -657,18 +750,35 @@ class Threativore:
                     regapp.reject(deny_message)
                     break
 
+    def log_memory_gauges(self):
+        """Logs the memory used by the process and the size of our in-memory structures,
+        so that a slow leak shows up as a steady climb across the logs of a few days"""
+        if Config.memory_log_interval <= 0 or time.monotonic() - self.last_memory_log < Config.memory_log_interval:
+            return
+        self.last_memory_log = time.monotonic()
+        rss = utils.get_rss_bytes()
+        rss_str = f"{rss / 1024 / 1024:.1f} MiB" if rss is not None else "unknown"
+        logger.info(
+            f"Memory gauges: RSS {rss_str}, "
+            f"{len(db.session.identity_map)} objects in the DB session, "
+            f"{len(self.seen_cache)} entities in the seen cache"
+        )
+
     def standard_tasks(self):
-        with APP.app_context():
-            while True:
+        while True:
+            # Every iteration gets its own app context and with it a fresh DB session, which is closed at the end,
+            # so that neither the loaded objects nor open transactions pile up over the lifetime of the thread
+            with APP.app_context():
                 try:
                     self.check_pms()
                     self.check_posts()
                     self.check_comments()
                     self.resolve_reports()
+                    self.filters.quarantine_slow_filters()
+                    self.filters.flush_filter_stats()
                     self.check_applications()
-                    self.gc()
-                    time.sleep(5)
+                    self.log_memory_gauges()
                 except Exception as err:
                     logger.warning(f"Exception during loop: {err}. Will continue after sleep...")
                     raise err
-                    time.sleep(1)
+            time.sleep(5)
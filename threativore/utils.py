@@ -1,3 +1,4 @@
+import os
 import random
 import uuid
 
@@ -56,4 +57,12 @@ def get_predefined_flair_from_tag(requested_tag: str) -> str | None:
         if tag == requested_tag:
             return emoji
     return None
-        
\ No newline at end of file
+        
+
+def get_rss_bytes() -> int | None:
+    """Returns how much memory this process currently has resident. Only available on Linux."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None